@@ -11,15 +11,24 @@ class Leach(NodeAlgorithm):
 
     def initializer(self):
         ini_nodes = []
+        self.base_station = None
 	for node in self.network.nodes():
             node.memory[self.neighborsKey] = node.compositeSensor.read()['Neighbors']
             node.status = 'IDLE'
+            if node.type == 'B':
+                self.base_station = node
             if self.informationKey in node.memory:
                 node.status = 'INITIATOR'
                 ini_nodes.append(node)
         for ini_node in ini_nodes:
             self.network.outbox.insert(0, Message(header=NodeAlgorithm.INI, destination=ini_node))
 
+    def is_terminated(self):
+        # Simulation ends when base station has collected data from all
+        # cluster heads.
+        return (getattr(self, 'base_station', None) is not None and
+                self.base_station.status == 'DONE')
+
     def initiator(self, node, message):
         assert message.header == NodeAlgorithm.INI
         node.status = 'IDLE'
@@ -3,6 +3,7 @@ import sys
 sys.path.append("../pymote2.1")
 from pymote.message import Message
 from pymote.algorithm import NodeAlgorithm
+from pymote.propagation import PropagationModel
 import pdb
 from pymote.logger import logger
 # Using infinity from the numpy module
@@ -34,13 +35,17 @@ class MCFAlgorithm(NodeAlgorithm):
 
     def link_cost(self, message):
         # Using SNR for this.
-        signal_to_noise_ratio = message.destination.snr[0]
+        _d, prt, _rx_ok = self.network.link(message.source,
+                                            message.destination)
+        signal_to_noise_ratio = PropagationModel.pw_to_dbm(prt)
         l_cost = (0-(signal_to_noise_ratio/10))
 
         return l_cost
 
     def alternate_link_cost(self, message):
-        return message.destination.distance[-1]
+        d, _prt, _rx_ok = self.network.link(message.source,
+                                            message.destination)
+        return d
 
     def idle(self, node, message):
         BCost = float(message.data.split("=")[1])
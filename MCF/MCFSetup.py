@@ -8,6 +8,7 @@ import sys
 sys.path.append("../pymote2.1")
 from pymote.message import Message
 from pymote.algorithm import NodeAlgorithm
+from pymote.propagation import PropagationModel
 import pdb
 # Using infinity from the numpy module
 # Although, we will be using a infinity-like value in the actual implementation,
@@ -20,6 +21,8 @@ class MCFSetup(NodeAlgorithm):
     # Key for data being updated in the node.
     required_params = ('sinkKey',)
     default_params = {}
+    # Timers of LISTENING nodes are counted in step even without messages.
+    always_step = True
 
 # Helper method to check if the message is an advertisement
     def check_if_adv(self, message):
@@ -55,7 +58,10 @@ class MCFSetup(NodeAlgorithm):
         # consumed_wireless_energy = message.destination.power.energy_consumption
         # Closer the SNR is to 0 ==> Better the signal received
         # SNR contains all the params. We can choose it to calculate link_cost
-        signal_to_noise_ratio = message.destination.snr[0]
+        # Mean SNR of the link the message was received over.
+        _d, prt, _rx_ok = self.network.link(message.source,
+                                            message.destination)
+        signal_to_noise_ratio = PropagationModel.pw_to_dbm(prt)
         # Normalizing the snr value as (0-snr/10) and adding the already existing
         # message cost(received from the message) to the same.
         link_cost = float(message.data) + (0-(signal_to_noise_ratio/10))
@@ -63,7 +69,9 @@ class MCFSetup(NodeAlgorithm):
         return link_cost
 
     def calculate_other_cost(self, message):
-        return float(message.data) + message.destination.distance[0]
+        d, _prt, _rx_ok = self.network.link(message.source,
+                                            message.destination)
+        return float(message.data) + d
 
     # After the initialization process, each node is set to an idle state.
     # On receiving the first "ADV", the node should transition itself to the
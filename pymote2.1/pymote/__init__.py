@@ -10,7 +10,7 @@ os.environ['QT_API'] = 'pyside'
 from pymote.conf import settings
 from pymote.network import Network
 from pymote.networkgenerator import NetworkGenerator
-from pymote.simulation import Simulation
+from pymote.simulation import Simulation, HeadlessSimulation, EventSimulation
 from pymote.sensor import CompositeSensor
 from pymote.node import Node
 from pymote.environment import Environment
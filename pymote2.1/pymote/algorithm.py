@@ -1,4 +1,5 @@
 from pymote.message import Message
+from pymote.timing import TIMER
 from pymote.logger import logger
 from inspect import getmembers
 import pdb
@@ -118,19 +119,38 @@ class NodeAlgorithm(Algorithm):
     As indication of global termination of algorithm some method could
     optionally return True.
 
+    In EventSimulation timers armed with network.timing.set_timer are
+    passed to STATUS functions as messages with header TIMER.
+
+    Simulation steps only nodes that have messages in inbox. Algorithms that
+    override step to do some work in every step regardless of messages
+    should set always_step to True.
+
     """
 
     INI = 'initialize'
+    TIMER = TIMER
     STATUS = {}
+    always_step = False
 
     def initializer(self):
         """ Pass INI message to certain nodes in network based on type."""
         node = self.network.nodes()[0]
-        self.network.outbox.insert(0, Message(header=NodeAlgorithm.INI,
-                                             destination=node))
+        self.network.outbox.appendleft(Message(header=NodeAlgorithm.INI,
+                                               destination=node))
         for node in self.network.nodes():
             node.status = 'IDLE'
 
+    def is_terminated(self):
+        """
+        Algorithm specific global termination condition, i.e. base station
+        has collected all data.
+
+        Simulation checks it before every step in addition to the default
+        condition that there are no more messages to pass.
+        """
+        return False
+
     def step(self, node):
         """ Executes one step of the algorithm for given node."""
         message = node.receive()
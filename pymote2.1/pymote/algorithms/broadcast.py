@@ -16,8 +16,8 @@ class Flood(NodeAlgorithm):
                 node.status = 'INITIATOR'
                 ini_nodes.append(node)
         for ini_node in ini_nodes:
-            self.network.outbox.insert(0, Message(header=NodeAlgorithm.INI,
-                                                 destination=ini_node))
+            self.network.outbox.appendleft(Message(header=NodeAlgorithm.INI,
+                                                   destination=ini_node))
 
     def initiator(self, node, message):
         if message.header == NodeAlgorithm.INI:
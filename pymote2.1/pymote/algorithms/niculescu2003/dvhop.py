@@ -1,5 +1,6 @@
 from pymote.algorithms.niculescu2003.floodingupdate import FloodingUpdate
 from numpy import concatenate, array, sqrt, dot
+from pymote.message import clone
 
 
 class DVHop(FloodingUpdate):
@@ -33,6 +34,7 @@ class DVHop(FloodingUpdate):
                    landmark_data[2] < node.memory[self.dataKey][landmark][2]:
                 node.memory[self.dataKey][landmark] = array(landmark_data)
                 # increase hopcount
+                landmark_data = clone(landmark_data)
                 landmark_data[2] += 1
                 updated_data[landmark] = landmark_data
 
@@ -7,6 +7,8 @@ class FloodingUpdate(NodeAlgorithm):
     This is modified Flooding algorithm (Santoro2007 p.13) so that every node
     continues to forward flood messages as long as information gathered is
     updating its knowledge.
+    Flood messages data is frozen, handle_flood_message should clone() data
+    it needs to modify.
     Note: does not have global termination detection
     Costs: ?
     """
@@ -19,20 +21,20 @@ class FloodingUpdate(NodeAlgorithm):
 
         for node in self.network.nodes():
             if self.initiator_condition(node):
-                self.network.outbox.insert(0, Message(destination=node,
-                                                     header=NodeAlgorithm.INI))
+                self.network.outbox.appendleft(Message(destination=node,
+                                                       header=NodeAlgorithm.INI))
             node.status = 'FLOODING'
 
     def flooding(self, node, message):
         if message.header == NodeAlgorithm.INI:
             node.send(Message(header='Flood',
-                              data=self.initiator_data(node)))
+                              data=self.initiator_data(node), frozen=True))
 
         if message.header == 'Flood':
             updated_data = self.handle_flood_message(node, message)
             if updated_data:
                 node.send(Message(header='Flood',
-                                  data=updated_data))
+                                  data=updated_data, frozen=True))
 
     def initiator_condition(self, node):
         raise NotImplementedError
@@ -1,4 +1,5 @@
 from pymote.algorithm import NetworkAlgorithm
+from pymote.sensor import read_sensors
 
 
 class ReadSensors(NetworkAlgorithm):
@@ -7,6 +8,6 @@ class ReadSensors(NetworkAlgorithm):
     default_params = {'sensorReadingsKey': 'sensorReadings'}
 
     def run(self):
+        readings = read_sensors(self.network)
         for node in self.network.nodes():
-            node.memory.update({self.sensorReadingsKey:
-                                node.compositeSensor.read()})
+            node.memory.update({self.sensorReadingsKey: readings[node]})
@@ -1,5 +1,6 @@
 from pymote.algorithms.shazad2015.floodingupdate import FloodingUpdate
 from numpy import concatenate, array, sqrt, dot
+from pymote.message import clone
 
 
 class DVHop(FloodingUpdate):
@@ -37,6 +38,7 @@ class DVHop(FloodingUpdate):
                     landmark_data[2] < maxHop:
                 node.memory[self.dataKey][landmark] = array(landmark_data)
                 # increase hopcount
+                landmark_data = clone(landmark_data)
                 landmark_data[2] += 1
                 updated_data[landmark] = landmark_data
 
@@ -1,11 +1,14 @@
 from pymote.conf import settings
-from numpy import sqrt
+from numpy import sqrt, array, trunc
 from numpy.random import random
 
 
 class ChannelType(object):
     """ChannelType abstract base class."""
 
+    #: incremented when channel params change, invalidates cached neighbors
+    version = 0
+
     def __new__(self, environment=None, **kwargs):
         """Return instance of default ChannelType."""
         for cls in self.__subclasses__():
@@ -19,9 +22,37 @@ class ChannelType(object):
     def in_comm_range(self, network, node1, node2):
         raise NotImplementedError
 
+    def in_updated_comm_range(self, network, source, destination):
+        """ Can source reach destination, by default in_comm_range. """
+        return self.in_comm_range(network, source, destination)
+
+    # Batch versions take source node and list of candidate nodes and return
+    # boolean mask, they are used by network edge and neighbors calculation.
+    # Subclasses should override them with vectorized versions.
+
+    def in_comm_range_array(self, network, source, nodes):
+        return array([self.in_comm_range(network, source, node)
+                      for node in nodes], dtype=bool)
+
+    def in_updated_comm_range_array(self, network, source, nodes):
+        return self.in_comm_range_array(network, source, nodes)
+
+    def _visible(self, network, source, nodes, mask):
+        """ Clear mask where nodes are not visible from source. """
+        check = mask.nonzero()[0]
+        if len(check):
+            mask[check] = self.environment.are_visible_array(
+                network.pos[source],
+                network.pos.as_array([nodes[i] for i in check]))
+        return mask
+
     def set_params(self, doi):
         raise NotImplementedError
 
+    def max_comm_range(self, node):
+        """Distance beyond which node can't reach any other node."""
+        return node.commRange
+
 class Udg(ChannelType):
     """Unit disc graph channel type."""
 
@@ -31,22 +62,26 @@ class Udg(ChannelType):
     def in_comm_range(self, network, node1, node2):
         """Two nodes are in communication range if they can see each other and
         are positioned so that their distance is smaller than commRange."""
-        p1 = network.pos[node1]
-        p2 = network.pos[node2]
-        d = sqrt(sum(pow(p1 - p2, 2)))
+        d = network.pos.distance(node1, node2)
         if (d < node1.commRange or d < node2.commRange):
             #if (self.environment.are_visible(p1, p2)):
                 return True
         return False
 
     def in_updated_comm_range(self, network, source, destination):
-        p1 = network.pos[source]
-        p2 = network.pos[destination]
-        d = sqrt(sum(pow(p1 - p2, 2)))
+        d = network.pos.distance(source, destination)
         if (d < source.commRange):
             return True
         return False
 
+    def in_comm_range_array(self, network, source, nodes):
+        d = network.pos.distances(source, nodes)
+        ranges = array([node.commRange for node in nodes], dtype=float)
+        return (d < source.commRange) | (d < ranges)
+
+    def in_updated_comm_range_array(self, network, source, nodes):
+        return network.pos.distances(source, nodes) < source.commRange
+
 class SquareDisc(ChannelType):
     """ Probability of connection is 1-d^2/r^2 """
 
@@ -63,6 +98,11 @@ class SquareDisc(ChannelType):
                 return True
         return False
 
+    def in_comm_range_array(self, network, source, nodes):
+        d = network.pos.distances(source, nodes)
+        mask = random(len(d)) > d ** 2 / source.commRange ** 2
+        return self._visible(network, source, nodes, mask)
+
 
 class Doi(ChannelType):
     """ Probability of connection is
@@ -74,6 +114,10 @@ class Doi(ChannelType):
 
     def set_params(self, doi):
         self.doi = doi
+        self.version += 1
+
+    def max_comm_range(self, node):
+        return node.commRange * (1.0 + self.doi)
 
     def in_comm_range(self, network, node1, node2):
         p1 = network.pos[node1]
@@ -97,3 +141,10 @@ class Doi(ChannelType):
                 #assert node1.commRange == node2.commRange
                 return True
         return False
+
+    def in_comm_range_array(self, network, source, nodes):
+        dr = network.pos.distances(source, nodes) / source.commRange
+        band = (dr >= (1.0 - self.doi)) & (dr <= (1.0 + self.doi))
+        p = trunc(0.5 * self.doi * (dr - 1) + 0.5)
+        mask = (dr < (1.0 - self.doi)) | (band & (p > 1))
+        return self._visible(network, source, nodes, mask)
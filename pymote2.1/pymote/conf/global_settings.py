@@ -41,6 +41,16 @@ SENSORS = ('NeighborsSensor',)
 #: Not implemented yet
 ACTUATORS = ()
 
+#: Retention of node energy, distance and snr traces: 'all' keeps every
+#: value, 'last' keeps last :py:data:`STATS_SIZE` values and 'summary' keeps
+#: only count, mean, std, min, max and last value, see
+#: :class:`pymote.utils.statbuffer.StatBuffer`.
+STATS_RETENTION = 'all'
+
+#: Number of values kept in node traces when :py:data:`STATS_RETENTION` is
+#: 'last'.
+STATS_SIZE = 100
+
 #: Probability function (by default :py:data:`scipy.stats.norm`) and its
 #: parameters for :class:`pymote.sensor.AoASensor`
 AOA_PF_PARAMS = {'pf': scipy.stats.norm,
@@ -1,9 +1,13 @@
 from pymote.conf import settings
 from pymote.logger import logger
 
+import os
 import png
-from itertools import imap
-from numpy import vstack, uint8, ones
+from numpy import uint8, uint16, uint32, uint64, ones, zeros, asarray, \
+    where, empty, trunc, round_, column_stack, broadcast_to, errstate, \
+    array, frombuffer, load, save, memmap, maximum, minimum, floor, ceil, \
+    log2, repeat, arange, cumsum, bincount, unique, abs as np_abs
+from numpy.random import rand, randint
 from numpy.core.numeric import sign, sqrt, Inf
 
 
@@ -22,25 +26,54 @@ class Environment(object):
     def is_space(self, xy):
         raise NotImplementedError
 
+    def is_space_array(self, xy):
+        raise NotImplementedError
+
+    def random_space(self, n=1):
+        """ Returns n x dim array of random positions in free space. """
+        raise NotImplementedError
+
     def are_visible(self, xy1, xy2):
         raise NotImplementedError
 
+    def are_visible_array(self, xy0, xy1):
+        """ Vectorized are_visible from point or N x 2 array of points xy0
+        to N x 2 array of points xy1, returns boolean array. """
+        xy1 = asarray(xy1, dtype=float).reshape(-1, 2)
+        xy0 = broadcast_to(asarray(xy0, dtype=float), xy1.shape)
+        return array([self.are_visible(p0, p1) for p0, p1 in zip(xy0, xy1)],
+                     dtype=bool)
+
 
 class Environment2D(Environment):
     """
     Base class for 2D environment.
     The Environment2D allows to define map and scale of 2D environment.
+
+    Results of are_visible are cached by segment endpoints and free pixels
+    are counted in occupancy pyramid. Caches are cleared when im is assigned
+    but should be cleared with clear_cache() if im is changed in place.
     """
 
-    def __init__(self, path='', scale=None, shape=None):
+    #: maximum number of cached segments, cache is cleared when it is full
+    visibility_cache_size = 1000000
+
+    def __init__(self, path='', scale=None, shape=None, cache=False):
+        """
+        Environment image is loaded from png file at path, its first channel
+        is used and pixels with value 0 are obstacles.
+
+        Caching is opt-in, if cache is True decoded image is saved next to
+        png as path + '.npy' (so png directory must be writable) and when
+        environment is created again from the same unchanged png the cached
+        file is memory-mapped read-only instead of decoding png. Mapped
+        images are shared by processes and pickled as file name only. To
+        modify loaded image replace it with its copy: env.im = env.im.copy().
+        """
         shape = shape if shape else settings.ENVIRONMENT2D_SHAPE
         if (path):
             try:
-                r = png.Reader(path)
-                planes = r.read()[3]['planes']
-                self.im = vstack(imap(uint8, r.asDirect()[2]))[:, ::planes]
-                self.im = self.im[::-1, :]  # flip-up-down
-                assert((r.height, r.width) == self.im.shape)
+                self.im = self._load(path, cache)
             except IOError:
                 print 'Can\'t open %s creating new default environment.' % path
 
@@ -53,11 +86,107 @@ class Environment2D(Environment):
         if scale > 1:
             raise NotImplementedError
 
+    @staticmethod
+    def _load(path, cache=False):
+        """ Returns image from png at path as uint8 array flipped up-down,
+        see __init__ for caching. """
+        npy = path + '.npy'
+        if (cache and os.path.exists(npy) and
+                os.path.getmtime(npy) >= os.path.getmtime(path)):
+            return load(npy, mmap_mode='r')
+        r = png.Reader(path)
+        width, height, rows, info = r.asDirect()
+        planes = info['planes']
+        im = empty((height, width), dtype=uint8)
+        for i, row in enumerate(rows):
+            row = frombuffer(row, dtype=uint8) if isinstance(row, bytearray) \
+                else uint8(row)
+            im[height - 1 - i] = row[::planes]  # flip-up-down
+        if cache:
+            try:
+                # save under temporary name so that other processes never
+                # map partially written file
+                tmp = '%s.%d.tmp' % (npy, os.getpid())
+                with open(tmp, 'wb') as fh:
+                    save(fh, im)
+                os.rename(tmp, npy)
+                return load(npy, mmap_mode='r')
+            except (IOError, OSError), e:
+                logger.warning('Can\'t cache environment image %s: %s'
+                               % (npy, e))
+        return im
+
     def __deepcopy__(self, memo):
         dup = Environment2D()
         dup.im = self.im.copy()
         return dup
 
+    @property
+    def im(self):
+        """ Environment image, assigning new image clears caches. """
+        return self._im
+
+    @im.setter
+    def im(self, im):
+        self._im = im
+        self.clear_cache()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_visibility', None)
+        state.pop('_occupancy', None)
+        state['im'] = state.pop('_im')
+        if isinstance(self.im, memmap) and self.im.filename and \
+                self.im.mode == 'r':
+            # read-only mapped image is unchanged, pickle only file name
+            state['im'] = self.im.filename
+        return state
+
+    def __setstate__(self, state):
+        im = state.pop('im')
+        if isinstance(im, basestring):
+            im = load(im, mmap_mode='r')
+        self.__dict__.update(state)
+        self.im = im
+
+    def clear_cache(self):
+        """ Clear cached are_visible results and free pixels index, i.e.
+        after im change. """
+        # {(x0, y0, x1, y1): visible}, see are_visible
+        self._visibility = {}
+        # OccupancyPyramid of im, see occupancy
+        self._occupancy = None
+
+    @property
+    def occupancy(self):
+        """ OccupancyPyramid of free pixels in im, built on first use. """
+        if self._occupancy is None:
+            self._occupancy = OccupancyPyramid(self.im)
+        return self._occupancy
+
+    def random_space(self, n=1):
+        """
+        Returns n x 2 array of random positions uniformly distributed in free
+        space.
+
+        Random free pixels are drawn from occupancy pyramid and position
+        inside pixel is random so there is no rejection sampling. If all
+        pixels are free positions are drawn directly in whole environment.
+        Raises PymoteEnvironmentError if there is no free space.
+
+        """
+        h, w = self.im.shape
+        occupancy = self.occupancy
+        if not occupancy.free_count:
+            raise PymoteEnvironmentError('Environment has no free space.')
+        if occupancy.free_count == h * w:
+            return rand(n, 2) * (w, h)
+        rows, cols = occupancy.sample(n)
+        offset = rand(n, 2)
+        # position on pixel edge is free only if neighbor pixel is free
+        offset[offset == 0] = .5
+        return column_stack((cols, rows)) + offset
+
     def is_space(self, xy):
         """ Returns true if selected space (x,y) is space. If point xy
         is exactly on the edge or crossing check surrounding pixels. """
@@ -80,6 +209,29 @@ class Environment2D(Environment):
             check = False
         return check
 
+    def is_space_array(self, xy):
+        """ Vectorized is_space for N x 2 array of points, returns boolean
+        array. Points on pixel edges are checked as in is_space. """
+        xy = asarray(xy, dtype=float).reshape(-1, 2)
+        x = xy[:, 0]
+        y = xy[:, 1]
+        h, w = self.im.shape
+        check = (x >= 0) & (x <= w) & (y >= 0) & (y <= h)
+        # int(x) == w or int(y) == h is outside of image
+        ix = where(check, x, 0).astype(int)
+        iy = where(check, y, 0).astype(int)
+        check &= (ix < w) & (iy < h)
+        ix[~check] = 0
+        iy[~check] = 0
+        space = self.im != 0
+        edge_x = x % 1 == 0
+        edge_y = y % 1 == 0
+        check &= space[iy, ix]
+        check &= ~edge_x | space[iy, ix - 1]
+        check &= ~edge_y | space[iy - 1, ix]
+        check &= ~(edge_x & edge_y) | space[iy - 1, ix - 1]
+        return check
+
     def are_visible(self, xy0, xy1):
         """
         Returns true if there is line of sight between source (x0,y0) and
@@ -89,6 +241,105 @@ class Environment2D(Environment):
         not spread on diagonal pixels.
 
         """
+        key = (float(xy0[0]), float(xy0[1]), float(xy1[0]), float(xy1[1]))
+        try:
+            return self._visibility[key]
+        except KeyError:
+            pass
+        visible = (self.occupancy.clear_segments([xy0], [xy1])[0] or
+                   self._walk(xy0, xy1))
+        self._cache_visibility([key], [visible])
+        return visible
+
+    def _cache_visibility(self, keys, visible):
+        if len(self._visibility) + len(keys) > self.visibility_cache_size:
+            self._visibility = {}
+        self._visibility.update(zip(keys, visible))
+
+    def are_visible_array(self, xy0, xy1):
+        """
+        Vectorized are_visible from point or N x 2 array of points xy0 to
+        N x 2 array of points xy1, returns boolean array.
+
+        Segments that are not cached and that do not pass only through free
+        blocks of occupancy pyramid are walked together, one pixel edge
+        crossing of all unfinished segments in each iteration, with the same
+        floating point steps as are_visible.
+
+        """
+        xy1 = asarray(xy1, dtype=float).reshape(-1, 2)
+        xy0 = broadcast_to(asarray(xy0, dtype=float), xy1.shape)
+        n = len(xy1)
+        visible = empty(n, dtype=bool)
+        keys = [tuple(k) for k in column_stack((xy0, xy1)).tolist()]
+        missing = []
+        cache = self._visibility
+        for i, key in enumerate(keys):
+            try:
+                visible[i] = cache[key]
+            except KeyError:
+                missing.append(i)
+        if missing:
+            missing = array(missing)
+            clear = self.occupancy.clear_segments(xy0[missing],
+                                                  xy1[missing])
+            visible[missing[clear]] = True
+            walk = missing[~clear]
+            if len(walk):
+                visible[walk] = self._walk_array(xy0[walk], xy1[walk])
+            self._cache_visibility([keys[i] for i in missing],
+                                   visible[missing].tolist())
+        return visible
+
+    def _walk_array(self, xy0, xy1):
+        x = xy0[:, 0].copy()
+        y = xy0[:, 1].copy()
+        x1 = xy1[:, 0]
+        y1 = xy1[:, 1]
+        ix1 = trunc(x1)
+        iy1 = trunc(y1)
+
+        def arrived(i):
+            ix = trunc(x[i])
+            iy = trunc(y[i])
+            return (((ix == ix1[i]) | ((x[i] % 1 == 0) & (ix - 1 == ix1[i])))
+                    & ((iy == iy1[i]) |
+                       ((y[i] % 1 == 0) & (iy - 1 == iy1[i]))))
+
+        visible = ones(len(x), dtype=bool)
+        travelled = zeros(len(x))
+        with errstate(divide='ignore', invalid='ignore'):
+            d = sqrt(pow(x1 - x, 2) + pow(y1 - y, 2))
+            incrE = (x1 - x) / d
+            incrN = (y1 - y) / d
+            walking = (~arrived(slice(None))).nonzero()[0]
+            while len(walking):
+                xs, ys = x[walking], y[walking]
+                e, n = incrE[walking], incrN[walking]
+                fx, fy = xs % 1, ys % 1
+                dx = where(e > 0, 1 - fx, where(fx == 0, 1.0, fx))
+                dy = where(n > 0, 1 - fy, where(fy == 0, 1.0, fy))
+                cx = where(e != 0, abs(dx / e), Inf)
+                cy = where(n != 0, abs(dy / n), Inf)
+                t = travelled[walking] + minimum(cx, cy)
+                travelled[walking] = t
+                ahead = t <= d[walking]
+                walking = walking[ahead]
+                xs, ys, e, n = xs[ahead], ys[ahead], e[ahead], n[ahead]
+                dx, dy, cx, cy = dx[ahead], dy[ahead], cx[ahead], cy[ahead]
+                east = cx < cy
+                xs = where(east, round_(xs + sign(e) * dx), xs + cy * e)
+                ys = where(east, ys + cx * n, round_(ys + sign(n) * dy))
+                x[walking] = xs
+                y[walking] = ys
+                space = self.is_space_array(column_stack((xs, ys)))
+                visible[walking[~space]] = False
+                walking = walking[space]
+                walking = walking[~arrived(walking)]
+        return visible
+
+    def _walk(self, xy0, xy1):
+        """ Scalar line of sight walk, see are_visible. """
         x = x0 = xy0[0]
         y = y0 = xy0[1]
         x1 = xy1[0]
@@ -96,6 +347,7 @@ class Environment2D(Environment):
         d = sqrt(pow(x1 - x0, 2) + pow(y1 - y0, 2))
         incrE = (x1 - x0) / d  # incrE is cos in direction of x axis
         incrN = (y1 - y0) / d  # incrN is sin in direction of y axis
+        travelled = 0.
 
         # check if pixel (x,y) is target pixel (x1,y1) or
         # if float (x,y) is on N or E edge then check also W or S neighbor
@@ -123,6 +375,12 @@ class Environment2D(Environment):
             else:
                 cy = Inf
 
+            # stop if next edge is beyond destination, i.e. when arrival
+            # check above missed integer destination by rounding error
+            travelled += min(cx, cy)
+            if travelled > d:
+                break
+
             # if path needed to hit N/S edge is longer than E/W
             if cx < cy:
                 x = round(x + sign(incrE) * dx)  # spread on E
@@ -135,3 +393,125 @@ class Environment2D(Environment):
             if (not self.is_space([x, y])):
                 return False
         return True
+
+
+class OccupancyPyramid(object):
+    """
+    Multi-resolution pyramid of free pixel counts over environment image.
+
+    Level 0 is 1 where image pixel is free and each cell of level k + 1 is
+    sum of 2 x 2 cells of level k, so cell (i, j) of level k is number of
+    free pixels in 2^k x 2^k block of image. Image is padded with obstacles
+    on odd sizes. Block is fully free if its count is 4^k and fully blocked
+    if it is 0. Dense image stays the source of truth, pyramid is used to
+    skip per pixel work and for random placement weighted by free area.
+
+    """
+
+    def __init__(self, im):
+        level = (asarray(im) != 0).astype(uint8)
+        self.shape = level.shape
+        self.levels = [level]
+        while level.shape[0] > 1 or level.shape[1] > 1:
+            h, w = level.shape
+            k = len(self.levels)
+            padded = zeros((h + h % 2, w + w % 2), dtype=self._dtype(k))
+            padded[:h, :w] = level
+            level = padded[0::2, 0::2] + padded[0::2, 1::2] + \
+                padded[1::2, 0::2] + padded[1::2, 1::2]
+            self.levels.append(level)
+        self.free_count = int(self.levels[-1][0, 0])
+
+    @staticmethod
+    def _dtype(k):
+        """ Smallest unsigned type that holds 4^k. """
+        for dtype, bits in ((uint8, 8), (uint16, 16), (uint32, 32)):
+            if 2 * k < bits:
+                return dtype
+        return uint64
+
+    def is_free_rect(self, c0, r0, c1, r1):
+        """
+        Returns boolean array, True where all pixels with columns c0..c1 and
+        rows r0..r1 (inclusive) are free.
+
+        Each rectangle is checked with at most 2 x 2 cells of the level on
+        which it fits in one cell so result is conservative: False only
+        means that there may be obstacle near the rectangle.
+
+        """
+        c0, r0, c1, r1 = [asarray(a, dtype=int) for a in (c0, r0, c1, r1)]
+        h, w = self.shape
+        inside = (c0 >= 0) & (r0 >= 0) & (c1 < w) & (r1 < h)
+        extent = maximum(c1 - c0, r1 - r0) + 1
+        with errstate(divide='ignore'):
+            k = ceil(log2(maximum(extent, 1))).astype(int)
+        k = minimum(k, len(self.levels) - 1)
+        free = zeros(len(c0), dtype=bool)
+        for level in unique(k[inside]):
+            sel = (inside & (k == level)).nonzero()[0]
+            cells = self.levels[level]
+            full = 4 ** level
+            i0, i1 = r0[sel] >> level, r1[sel] >> level
+            j0, j1 = c0[sel] >> level, c1[sel] >> level
+            free[sel] = ((cells[i0, j0] == full) & (cells[i0, j1] == full) &
+                         (cells[i1, j0] == full) & (cells[i1, j1] == full))
+        return free
+
+    def clear_segments(self, xy0, xy1, piece=5):
+        """
+        Returns boolean array, True where segments from points xy0 to points
+        xy1 surely have line of sight, that is segment is split into parts
+        of at most `piece` pixels and each part with its neighbouring pixels
+        lies in fully free cells. False means segment needs to be walked.
+        """
+        xy0 = asarray(xy0, dtype=float).reshape(-1, 2)
+        xy1 = asarray(xy1, dtype=float).reshape(-1, 2)
+        n = len(xy0)
+        if not n:
+            return zeros(0, dtype=bool)
+        delta = xy1 - xy0
+        parts = maximum(ceil(np_abs(delta).max(axis=1) / piece), 1)
+        parts = parts.astype(int)
+        segment = repeat(arange(n), parts)
+        j = arange(len(segment)) - repeat(cumsum(parts) - parts, parts)
+        t0 = (j / parts[segment].astype(float))[:, None]
+        t1 = ((j + 1) / parts[segment].astype(float))[:, None]
+        a = xy0[segment] + t0 * delta[segment]
+        b = xy0[segment] + t1 * delta[segment]
+        # walk checks pixels left and below points on pixel edges
+        low = floor(minimum(a, b)).astype(int) - 1
+        high = floor(maximum(a, b)).astype(int) + 1
+        free = self.is_free_rect(low[:, 0], low[:, 1], high[:, 0], high[:, 1])
+        return bincount(segment[~free], minlength=n) == 0
+
+    def sample(self, n):
+        """
+        Returns rows and columns of n random free pixels, every free pixel
+        is equally likely. Pixels are drawn by descending the pyramid with
+        integer weights so no rejection is needed.
+        """
+        rank = randint(self.free_count, size=n)
+        rows = zeros(n, dtype=int)
+        cols = zeros(n, dtype=int)
+        for level in range(len(self.levels) - 1, 0, -1):
+            children = self.levels[level - 1]
+            h, w = children.shape
+            rows *= 2
+            cols *= 2
+            chosen = zeros(n, dtype=bool)
+            for dr, dc in ((0, 0), (0, 1), (1, 0), (1, 1)):
+                r, c = rows + dr, cols + dc
+                count = zeros(n, dtype=int)
+                inside = (r < h) & (c < w)
+                count[inside] = children[r[inside], c[inside]]
+                take = ~chosen & (rank < count)
+                rows[take] = r[take]
+                cols[take] = c[take]
+                chosen |= take
+                rank = where(chosen, rank, rank - count)
+        return rows, cols
+
+
+class PymoteEnvironmentError(Exception):
+    pass
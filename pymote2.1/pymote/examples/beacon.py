@@ -50,8 +50,8 @@ class Beacon(NodeAlgorithm):
         # buffer Beacon
         #        node.send(Message(header=NodeAlgorithm.INI))
         for ini_node in ini_nodes:
-            self.network.outbox.insert(0, Message(header=NodeAlgorithm.INI,
-                                                  destination=ini_node))
+            self.network.outbox.appendleft(Message(header=NodeAlgorithm.INI,
+                                                   destination=ini_node))
 
     def initiator(self, node, message):
         # logger.info("INI")
@@ -177,14 +177,19 @@ class Topology(NetworkGenerator):
         nr = sqrt(self.n_count) * area/self.n_count/h
         k = 0
         print nr, sq
+        nodes = []
+        positions = []
         for x in range(self.n_count/sq + 1):
             for y in range(self.n_count/sq):
                 k += 1
                 rn = rand(2)*randomness
-                node = Node(**self.kwargs)
-                net.add_node(node, pos=(int((x + rn[0])*nr), int((y + rn[1])*nr)))
+                nodes.append(Node(**self.kwargs))
+                positions.append((int((x + rn[0])*nr), int((y + rn[1])*nr)))
                 if (k >= self.n_count):
-                    return net
+                    break
+            if (k >= self.n_count):
+                break
+        net.add_nodes(nodes, positions)
 
         return net
 
@@ -215,6 +220,8 @@ class Topology(NetworkGenerator):
                 cut_area += (box[1][0] - box[0][0])*(box[0][1] - box[1][1])
         self.area = area - cut_area
         done = False
+        nodes = []
+        positions = []
         for x in range(0, self.n_count / sq):
             if done:
                 break
@@ -235,12 +242,14 @@ class Topology(NetworkGenerator):
                     if (f_anchors and node.id % f_anchors==0):  # anchor nodes
                         node.compositeSensor = (TruePosSensor,)
                         node.type = 'C'  # Anchors
-                    net.add_node(node, pos=(xpos, ypos))
+                    nodes.append(node)
+                    positions.append((xpos, ypos))
 
 
                 if (k >= self.n_count):
                     done = True
                     break
+        net.add_nodes(nodes, positions)
 
         if p_anchors:
             self.anchors = (int)(len(net) *  p_anchors/100.0)
@@ -3,7 +3,7 @@ import sys
 import os  # @Reimport
 import numpy
 from PySide.QtGui import QMainWindow, QMenu, QCursor, QFileDialog, QMessageBox
-from PySide.QtCore import SIGNAL, QRect, QSize, QEvent
+from PySide.QtCore import SIGNAL, QRect, QSize, QEvent, QObject
 from matplotlib.figure import Figure
 from matplotlib.patches import Circle
 from matplotlib.backends.backend_qt4agg import FigureCanvasQTAgg \
@@ -15,6 +15,7 @@ from datetime import datetime
 from matplotlib.collections import PatchCollection, LineCollection
 import networkx as nx
 from pymote.algorithm import NodeAlgorithm
+from pymote.simulation import SimulationObserver
 from simulationui import Ui_SimulationWindow
 from dictionarytreemodel import DictionaryTreeModel
 from pymote.utils.localization.helpers import align_clusters, get_rms
@@ -22,6 +23,16 @@ from pymote.utils.memory.positions import Positions
 from copy import deepcopy
 
 
+class QtSimulationObserver(QObject, SimulationObserver):
+    """ Forwards simulation notifications as Qt signals. """
+
+    def redraw(self, simulation):
+        self.emit(SIGNAL('redraw()'))
+
+    def update_log(self, simulation, text):
+        self.emit(SIGNAL('updateLog(QString)'), text)
+
+
 class SimulationGui(QMainWindow):
     def __init__(self, net=None, parent=None, fname=None):
         QMainWindow.__init__(self)
@@ -97,8 +108,11 @@ class SimulationGui(QMainWindow):
     def init_sim(self, net):
         self.net = net
         self.sim = Simulation(net)
-        self.connect(self.sim, SIGNAL("redraw()"), self.redraw)
-        self.connect(self.sim, SIGNAL("updateLog(QString)"), self.update_log)
+        self.simObserver = QtSimulationObserver()
+        self.sim.add_observer(self.simObserver)
+        self.connect(self.simObserver, SIGNAL("redraw()"), self.redraw)
+        self.connect(self.simObserver, SIGNAL("updateLog(QString)"),
+                     self.update_log)
         self.redraw()
 
     def update_log(self, text):
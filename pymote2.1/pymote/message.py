@@ -1,21 +1,64 @@
 from copy import deepcopy
 from copy import copy
+from collections import deque
+from struct import calcsize
+from numpy import ndarray
 
 
 class Message(object):
 
+    __slots__ = ('source', 'destination', 'nexthop', 'frozen', '_header',
+                 '_data', '_payload_size', 'overhead_bytes')
+
     def __init__(self, source=None, destination=None, nexthop=None, header='',
-                 data={}):
+                 data={}, frozen=False):
+        """
+        If frozen is True data is converted to read-only payload with
+        freeze() and shared by all message copies instead of being deep
+        copied for each destination and neighbor. Receivers that need to
+        modify it should make writable copy with clone().
+        """
         self.source = source
         self.destination = destination
         self.nexthop = nexthop
-        self.header = header
+        self.frozen = frozen
+        self._header = header
         self.data = data
         self.overhead_bytes = 60
 
+    @property
+    def header(self):
+        return self._header
+
+    @header.setter
+    def header(self, header):
+        self._header = header
+        self._payload_size = None
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = freeze(data) if self.frozen else data
+        self._payload_size = None
+
     # in bytes
     def message_length(self):
-        return len(self.header + str(self.data)) + self.overhead_bytes
+        """
+        Returns message length in bytes, that is payload size plus
+        overhead_bytes.
+
+        Payload size is calculated with function registered for message
+        header in PAYLOAD_SIZE, default is str_size. It is calculated once
+        and shared by message copies, it is recalculated only when header or
+        data are assigned so in place changes of data are not accounted.
+        """
+        if self._payload_size is None:
+            size = PAYLOAD_SIZE.get(self._header, str_size)
+            self._payload_size = size(self._header, self._data)
+        return self._payload_size + self.overhead_bytes
 
     def __repr__(self):
         destination = self.destination
@@ -31,5 +74,173 @@ class Message(object):
 
     def copy(self):
         # nodes are protected from copying by __deepcopy__()
-        self.data = deepcopy(self.data)
+        if not self.frozen:
+            payload_size = self._payload_size
+            self.data = deepcopy(self.data)
+            self._payload_size = payload_size
         return copy(self)
+
+    def __copy__(self):
+        m = Message.__new__(self.__class__)
+        for name in Message.__slots__:
+            setattr(m, name, getattr(self, name))
+        return m
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in Message.__slots__)
+
+    def __setstate__(self, state):
+        # messages pickled before __slots__ have no frozen flag and set
+        # header and data through properties
+        self.frozen = state.get('frozen', False)
+        self._payload_size = None
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+def str_size(header, data):
+    """ Payload size as length of header and string representation of
+    data. """
+    return len(header + str(data))
+
+
+def packed_size(header, data):
+    """
+    Payload size of header as string and data with numbers packed as C types:
+    int 4, long 8, float 8 and bool 1 byte, arrays by their size in bytes and
+    nodes by 2 byte id. Other objects are sized by their str().
+    """
+    return len(header) + _packed_size(data)
+
+
+def _packed_size(data):
+    from pymote.node import Node
+    if data is None:
+        return 0
+    if isinstance(data, basestring):
+        return len(data.encode('utf-8') if isinstance(data, unicode) else data)
+    if isinstance(data, bool):
+        return calcsize('?')
+    if isinstance(data, int):
+        return calcsize('i')
+    if isinstance(data, long):
+        return calcsize('q')
+    if isinstance(data, float):
+        return calcsize('d')
+    if isinstance(data, ndarray):
+        return data.nbytes
+    if isinstance(data, Node):
+        return calcsize('H')
+    if isinstance(data, dict):
+        return sum([_packed_size(key) + _packed_size(value)
+                    for key, value in data.iteritems()])
+    if isinstance(data, (list, tuple, set, frozenset)):
+        return sum([_packed_size(value) for value in data])
+    return len(str(data))
+
+
+# {header: function(header, data)} returning payload size in bytes for
+# messages with given header, i.e. PAYLOAD_SIZE['Flood'] = packed_size
+PAYLOAD_SIZE = {}
+
+
+class FrozenPayloadError(TypeError):
+    pass
+
+
+def _frozen(self, *args, **kwargs):
+    raise FrozenPayloadError('Message data is frozen, use clone() to get '
+                             'writable copy.')
+
+
+class FrozenDict(dict):
+    """ Read-only dict used for frozen message data. """
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = \
+        update = _frozen
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class FrozenList(list):
+    """ Read-only list used for frozen message data. """
+
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = __iadd__ = \
+        __imul__ = append = extend = insert = pop = remove = reverse = \
+        sort = _frozen
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(data):
+    """
+    Returns read-only copy of data: dicts, lists and sets are replaced with
+    FrozenDict, FrozenList and frozenset and arrays are copied and marked not
+    writeable. Data that is already frozen is returned as is.
+    """
+    if isinstance(data, (FrozenDict, FrozenList, frozenset, basestring)):
+        return data
+    if isinstance(data, dict):
+        return FrozenDict((key, freeze(value))
+                          for key, value in data.iteritems())
+    if isinstance(data, list):
+        return FrozenList(freeze(value) for value in data)
+    if isinstance(data, tuple):
+        return tuple(freeze(value) for value in data)
+    if isinstance(data, set):
+        return frozenset(data)
+    if isinstance(data, ndarray):
+        if not data.flags.writeable and data.base is None:
+            return data
+        data = data.copy()
+        data.flags.writeable = False
+        return data
+    return deepcopy(data)
+
+
+def clone(data):
+    """ Returns writable deep copy of (frozen) message data or its part. """
+    if isinstance(data, dict):
+        return dict((key, clone(value)) for key, value in data.iteritems())
+    if isinstance(data, list):
+        return [clone(value) for value in data]
+    if isinstance(data, tuple):
+        return tuple(clone(value) for value in data)
+    if isinstance(data, ndarray):
+        return data.copy()
+    return deepcopy(data)
+
+
+class MessageQueue(deque):
+    """
+    Queue of messages used for nodes inbox and outbox and network outbox.
+
+    Messages are pushed to the left with appendleft and taken from the right
+    with pop, so both are O(1). Network outbox is also extended on the right
+    and drained with popleft. insert is kept for algorithms written when
+    boxes were lists.
+
+    """
+
+    def insert(self, index, message):
+        """ Inserts message before index, negative and out of range indices
+        are handled as in list.insert. """
+        n = len(self)
+        index = max(index + n, 0) if index < 0 else min(index, n)
+        self.rotate(-index)
+        self.appendleft(message)
+        self.rotate(index)
@@ -1,11 +1,16 @@
 import inspect
+from contextlib import contextmanager
+from collections import Counter
+from operator import attrgetter
+from bisect import bisect_left, bisect_right
 from copy import deepcopy
 import json
 import pdb
 
 from numpy.random import rand
 from numpy.core.numeric import Inf, allclose
-from numpy import array, pi, sign, max, min, isnan
+from numpy import array, pi, max, min, isnan, asarray, sqrt, log, \
+    argsort, concatenate, empty, nextafter
 from numpy.lib.function_base import average
 from networkx import DiGraph, Graph, is_connected
 import networkx as nx
@@ -20,7 +25,10 @@ from pymote.energy import EnergyModel
 from pymote import propagation
 from algorithm import Algorithm
 from pymote.sensor import CompositeSensor
+from pymote.nodestore import NodeStore, NodePositions, NodeOrientations
 from pymote.utils.helpers import pymote_equal_objects
+from pymote.message import MessageQueue
+from pymote.utils.disjointset import DisjointSet
 
 
 class Network(Graph):
@@ -29,6 +37,10 @@ class Network(Graph):
                  networkRouting=True, propagation_type=2, **kwargs):
 
         Graph.__init__(self)
+        # nodes ordered by id with id lookup, see nodes()
+        self._nodes = []
+        self._node_ids = []
+        self._node_by_id = {}
         self._environment = environment or Environment()
         # assert(isinstance(self.environment, Environment))
         self.channelType = channelType or ChannelType(self._environment)
@@ -38,20 +50,78 @@ class Network(Graph):
             self.channelType.set_params(doi=doi)
         self.channelType.environment = self._environment
         self.propagation = propagation.PropagationModel(propagation_type=propagation_type)
-        self.pos = {}
-        self.ori = {}
+        self.comm_range = kwargs.pop('commRange', None) or settings.COMM_RANGE
+        # positions and orientations are kept in arrays, pos and ori are
+        # dict like views, spatial index cells are sized by default commRange
+        self._store = NodeStore()
+        self.pos = NodePositions(self._store, cell_size=self.comm_range)
+        self.ori = NodeOrientations(self._store)
+        # {source: neighbors sorted by id}, see neighbors()
+        self._neighbors = {}
+        self._neighbors_stamp = None
+        # {source: (version, {destination: (version, link)})}, see link()
+        self._links = {}
+        self._links_stamp = None
+        # nodes whose edges are pending during batch_update, None for all
+        self._batch_depth = 0
+        self._batch_nodes = []
+        self._batch_set = set()
+        # DisjointSet of connected components, see is_connected()
+        self._components = None
+        # messages in nodes inboxes and outboxes and number of nodes in each
+        # status, kept up to date by nodes, see Simulation.is_halted
+        self.queued_messages = 0
+        self.status_counts = Counter()
+        # nodes that got messages in inbox, see active_nodes()
+        self.inbox_nodes = set()
+        # TimingModel that schedules deliveries in event driven simulation,
+        # None when messages are pushed directly into inboxes
+        self.timing = None
         self.labels = {}
         #self.star = star_graph
         self.name = "WSN"
         self._algorithms = ()
         self.algorithms = algorithms or settings.ALGORITHMS
         self.algorithmState = {'index': 0, 'step': 1, 'finished': False}
-        self.outbox = []
+        self.outbox = MessageQueue()
         self.networkRouting = networkRouting
-        self.comm_range = kwargs.pop('commRange', None) or settings.COMM_RANGE
         logger.info("Instance of Network has been initialized with %s (%s)" % (self.propagation, self.comm_range))
         print("------------------------------")
 
+    def __setstate__(self, state):
+        """
+        Networks pickled before positions were kept in NodeStore have pos
+        and ori dicts and no node order, caches and counters, these are
+        rebuilt from them.
+        """
+        self.__dict__.update(state)
+        if isinstance(self.pos, NodePositions):
+            return
+        pos, ori = self.pos, self.ori
+        self._nodes = []
+        self._node_ids = []
+        self._node_by_id = {}
+        self._store = NodeStore()
+        self.pos = NodePositions(self._store, cell_size=self.comm_range)
+        self.ori = NodeOrientations(self._store)
+        self._neighbors = {}
+        self._neighbors_stamp = None
+        self._links = {}
+        self._links_stamp = None
+        self._batch_depth = 0
+        self._batch_nodes = []
+        self._batch_set = set()
+        self._components = None
+        self.queued_messages = 0
+        self.status_counts = Counter()
+        self.inbox_nodes = set()
+        self.timing = None
+        self.outbox = MessageQueue(self.outbox)
+        for node in self.nodes():
+            self.pos[node] = pos[node]
+            self.ori[node] = ori.get(node, 0.)
+            self._count_node(node)
+
     def subgraph(self, nbunch):
         """ Returns Graph instance with nbunch nodes, see subnetwork. """
         return Graph(self).subgraph(nbunch)
@@ -74,8 +144,55 @@ class Network(Graph):
         return H
 
     def nodes(self, data=False):
-        """ Override, sort nodes by id, important for message ordering."""
-        return list(sorted(self.nodes_iter(data=data), key=lambda k: k.id))
+        """ Override, sort nodes by id, important for message ordering.
+
+        Ordered list is maintained by add_node and remove_node so it is not
+        sorted again on every call. """
+        nodes = self._ordered_nodes()
+        if data:
+            return [(n, self.node[n]) for n in nodes]
+        return list(nodes)
+
+    def _ordered_nodes(self):
+        if len(self._nodes) != len(self.node):
+            # nodes were added or removed bypassing add_node/remove_node
+            # i.e. in Graph.subgraph
+            self._order_nodes()
+        return self._nodes
+
+    def _order_nodes(self):
+        """ Rebuild id ordered node list and id lookup from scratch. """
+        self._nodes = sorted(self.nodes_iter(), key=lambda k: k.id)
+        self._node_ids = [n.id for n in self._nodes]
+        self._node_by_id = {}
+        for n in reversed(self._nodes):
+            self._node_by_id[n.id] = n
+
+    def _insert_ordered(self, node):
+        """ Insert node just added to graph in id ordered list. """
+        if len(self._nodes) + 1 != len(self.node):
+            self._order_nodes()
+            return
+        i = bisect_right(self._node_ids, node.id)
+        self._nodes.insert(i, node)
+        self._node_ids.insert(i, node.id)
+        self._node_by_id.setdefault(node.id, node)
+
+    def _remove_ordered(self, node):
+        """ Remove node just removed from graph from id ordered list. """
+        first = bisect_left(self._node_ids, node.id)
+        last = bisect_right(self._node_ids, node.id)
+        same_id = self._nodes[first:last]
+        if node not in same_id or len(self._nodes) - 1 != len(self.node):
+            self._order_nodes()
+            return
+        i = first + same_id.index(node)
+        del self._nodes[i]
+        del self._node_ids[i]
+        if self._node_by_id.get(node.id) is node:
+            del self._node_by_id[node.id]
+            if last - first > 1:
+                self._node_by_id[node.id] = self._nodes[first]
 
     @property
     def algorithms(self):
@@ -118,18 +235,24 @@ class Network(Graph):
             corresponding channelType environment must be changed also. """
         self._environment = environment
         self.channelType.environment = environment
-        for node in self.nodes():
-            self.remove_node(node)
-            self.add_node(node)
+        with self.batch_update():
+            for node in self.nodes():
+                self.remove_node(node)
+                self.add_node(node)
         logger.warning('All nodes are moved into new environment.')
 
     def remove_node(self, node):
         """ Remove node from network. """
-        if node not in self.nodes():
+        if node not in self:
             logger.error("Node not in network")
             return
         Graph.remove_node(self, node)
+        self._count_node(node, -1)
+        self._components = None
+        self._remove_ordered(node)
         del self.pos[node]
+        self.ori.pop(node, None)
+        self._links.pop(node, None)
         del self.labels[node]
         node.network = None
         logger.info('Node with id %d is removed.' % node.id)
@@ -167,6 +290,8 @@ class Network(Graph):
 
         if (self._environment.is_space(pos)):
             Graph.add_node(self, node)
+            self._count_node(node)
+            self._insert_ordered(node)
             self.pos[node] = array(pos)
             self.ori[node] = ori
             self.labels[node] = ('C' if node.type == 'C' else "") + str(node.id)
@@ -182,11 +307,93 @@ class Network(Graph):
             node = None
         return node
 
+    def add_nodes(self, nodes, positions=None, orientations=None,
+                  commRange=None):
+        """
+        Add multiple nodes to network with single edge calculation at the end.
+
+        Attributes:
+          `nodes` -- list of nodes to add or number of new nodes to create
+          `positions` -- N x 2 array, default: random free positions
+          `orientations` -- N array, default: random orientations
+
+        Nodes whose position is not free space are not added. Returns list of
+        added nodes.
+
+        """
+        if isinstance(nodes, int):
+            nodes = [None] * nodes
+        n = len(nodes)
+        if not n:
+            return []
+        if positions is None:
+            positions = [None] * n
+        missing = [i for i, p in enumerate(positions)
+                   if p is None or isnan(p[0])]
+        if missing:
+            positions = list(positions)
+            for i, p in zip(missing,
+                            self._environment.random_space(len(missing))):
+                positions[i] = p
+        positions = asarray(positions, dtype=float)[:, :2]
+        if orientations is None:
+            orientations = rand(n) * 2 * pi
+        orientations = asarray(orientations, dtype=float) % (2 * pi)
+        free = self._environment.is_space_array(positions)
+
+        added = []
+        for node, pos, ori, is_free in zip(nodes, positions, orientations,
+                                           free):
+            if not is_free:
+                logger.error('Given position is not free space. %s' % pos)
+                continue
+            if not node:
+                node = Node(commRange=commRange or self.comm_range)
+            if not node.commRange:
+                node.commRange = commRange or self.comm_range
+            if node.network:
+                logger.warning('Node is already in another network, '
+                               'can\'t add.')
+                continue
+            node.network = self
+            Graph.add_node(self, node)
+            self._count_node(node)
+            self._insert_ordered(node)
+            self.pos[node] = pos
+            self.ori[node] = ori
+            self.labels[node] = ('C' if node.type == 'C' else "") + \
+                                str(node.id)
+            added.append(node)
+        logger.debug('%d nodes are placed in network.' % len(added))
+        if added:
+            self.recalculate_edges(added)
+        return added
+
+    def active_nodes(self):
+        """ Returns nodes with messages in inbox ordered by id. """
+        active = [node for node in self.inbox_nodes
+                  if node.inbox and node in self]
+        self.inbox_nodes = set(active)
+        return sorted(active, key=attrgetter('id'))
+
+    def _count_node(self, node, sign=1):
+        """ Add (sign=1) or subtract (sign=-1) node messages and status from
+        network counters. """
+        self.queued_messages += sign * (len(node.inbox) + len(node.outbox))
+        self.status_counts[node.status] += sign
+        if sign > 0 and node.inbox:
+            self.inbox_nodes.add(node)
+
     def node_by_id(self, id_):
         """ Returns first node with given id. """
-        for n in self.nodes():
-            if (n.id == id_):
-                return n
+        self._ordered_nodes()
+        node = self._node_by_id.get(id_, None)
+        if node is None or node.id != id_:
+            # ids could have been changed after nodes were added
+            self._order_nodes()
+            node = self._node_by_id.get(id_, None)
+        if node is not None:
+            return node
         logger.error('Network has no node with id %d.' % id_)
         return None
 
@@ -195,24 +402,132 @@ class Network(Graph):
 
     def modify_avg_degree(self, value):
         """
-        Modifies (increases) average degree based on given value by
-        modifying nodes commRange."""
+        Modifies average degree based on given value by setting all nodes
+        commRange to comm_range_for_degree(value)."""
         # assert all nodes have same commRange
         assert allclose([n.commRange for n in self], self.nodes()[0].commRange)
-        #TODO: implement decreasing of degree, preserve connected network
-        assert value + settings.DEG_ATOL > self.avg_degree()  # only increment
-        step_factor = 7.
-        steps = [0]
-        #TODO: while condition should call validate
-        while not allclose(self.avg_degree(), value, atol=settings.DEG_ATOL):
-            steps.append((value - self.avg_degree())*step_factor)
-            for node in self:
-                node.commRange += steps[-1]
-            # variable step_factor for step size for over/undershoot cases
-            if len(steps)>2 and sign(steps[-2])!=sign(steps[-1]):
-                step_factor /= 2
+        self.set_comm_range(self.comm_range_for_degree(value))
+        if not allclose(self.avg_degree(), value, atol=settings.DEG_ATOL):
+            logger.warning("Could not modify degree to %f, degree is %f" %
+                           (value, self.avg_degree()))
         logger.debug("Modified degree to %f" % self.avg_degree())
 
+    def set_comm_range(self, commRange):
+        """ Set commRange of all nodes with single edges recalculation. """
+        with self.batch_update():
+            for node in self.nodes():
+                node.commRange = commRange
+
+    def pair_distances(self, max_distance):
+        """
+        Returns sorted distances of all node pairs closer than max_distance
+        and arrays of indexes of pair nodes in self.nodes().
+
+        Candidate pairs are found with spatial index so only pairs in cells
+        around each node are calculated.
+
+        """
+        nodes = self.nodes()
+        xy = self.pos.as_array(nodes)
+        index_of = dict((n, i) for i, n in enumerate(nodes))
+        distances = []
+        first = []
+        second = []
+        for i, node in enumerate(nodes):
+            candidates = array([index_of[n] for n in
+                                self.pos.index.query(xy[i], max_distance)],
+                               dtype=int)
+            candidates = candidates[candidates > i]
+            if not len(candidates):
+                continue
+            v = xy[candidates] - xy[i]
+            d = sqrt((v * v).sum(axis=1))
+            in_range = d < max_distance
+            distances.append(d[in_range])
+            first.append([i] * in_range.sum())
+            second.append(candidates[in_range])
+        if not distances:
+            return empty(0), empty(0, dtype=int), empty(0, dtype=int)
+        distances = concatenate(distances)
+        order = argsort(distances, kind='mergesort')
+        return (distances[order], concatenate(first)[order].astype(int),
+                concatenate(second)[order].astype(int))
+
+    def _initial_pair_range(self, degree):
+        """ Radius within which node has on average given number of
+        neighbors if nodes are uniformly distributed. """
+        h, w = self._environment.im.shape
+        return max([sqrt(degree * h * w / (pi * len(self))), 1.])
+
+    def _range_above(self, distance, next_distance):
+        """ Returns commRange between distance and next_distance such that
+        pairs at distance are in range (i.e. d < commRange). If distances are
+        equal it is smallest float greater than distance. """
+        comm_range = (distance + next_distance) / 2.
+        if comm_range > distance:
+            return comm_range
+        return nextafter(distance, Inf)
+
+    def comm_range_for_degree(self, degree):
+        """
+        Returns commRange with which network with unit disc channel has given
+        average degree.
+
+        Average degree for commRange r is 2*m/n where m is number of pairs
+        closer than r, so r is set between m-th and (m+1)-th sorted pair
+        distance. If those distances are equal all pairs at that distance are
+        in range. Pair distances are searched in doubling radius until at
+        least m+1 pairs are found.
+
+        """
+        n = len(self)
+        m = int(round(degree * n / 2.))
+        h, w = self._environment.im.shape
+        diagonal = sqrt(h * h + w * w)
+        radius = 1.5 * self._initial_pair_range(degree)
+        while True:
+            distances = self.pair_distances(radius)[0]
+            if len(distances) > m or radius > diagonal:
+                break
+            radius *= 2
+        if not len(distances):
+            return radius
+        if m == 0:
+            return distances[0] / 2.
+        if m >= len(distances):
+            return distances[-1] + 1.
+        return self._range_above(distances[m - 1], distances[m])
+
+    def connectivity_comm_range(self):
+        """
+        Returns minimal commRange with which network with unit disc channel is
+        connected.
+
+        That is the longest edge of Euclidean minimum spanning tree, found by
+        Kruskal algorithm over sorted pair distances.
+
+        """
+        n = len(self)
+        if n < 2:
+            return 0.
+        h, w = self._environment.im.shape
+        diagonal = sqrt(h * h + w * w)
+        radius = 1.5 * self._initial_pair_range(max([log(n), 1.]))
+        while True:
+            distances, first, second = self.pair_distances(radius)
+            components = DisjointSet(range(n))
+            for k in xrange(len(distances)):
+                if components.union(first[k], second[k]) and \
+                        components.count == 1:
+                    if k + 1 < len(distances):
+                        return self._range_above(distances[k],
+                                                 distances[k + 1])
+                    return distances[k] + 1.
+            if radius > diagonal:
+                logger.error('Network could not be connected.')
+                return radius
+            radius *= 2
+
     def get_current_algorithm(self):
         """ Try to return current algorithm based on algorithmState. """
         if len(self.algorithms) == 0:
@@ -327,54 +642,216 @@ class Network(Graph):
         return fig
 
     def neighbors(self, node):
-        all_neighbors = []
-        for n in self.nodes():
-            if self.channelType.in_updated_comm_range(self, node, n):
-                all_neighbors.append(n)
+        """
+        Returns list of nodes in node's updated communication range sorted by
+        id.
+
+        Neighbors are cached per source node. Cache is cleared when positions
+        or channelType (or its params) change and when edges are recalculated
+        i.e. on commRange change.
+
+        """
+        stamp = (self.pos.version, self.channelType, self.channelType.version)
+        if stamp != self._neighbors_stamp:
+            self._neighbors = {}
+            self._neighbors_stamp = stamp
+        try:
+            return list(self._neighbors[node])
+        except KeyError:
+            pass
+        candidates = self._candidates(node)
+        mask = self.channelType.in_updated_comm_range_array(self, node,
+                                                            candidates)
+        all_neighbors = sorted([candidates[i] for i in mask.nonzero()[0]],
+                               key=lambda k: k.id)
+        self._neighbors[node] = all_neighbors
+        return list(all_neighbors)
+
+    def link(self, source, destination):
+        """
+        Returns (distance, prt, rx_ok) of link from source to destination.
 
-        return all_neighbors
+        prt is received power ratio without shadowing noise and rx_ok is
+        True if it is above receive threshold or None if link is shadowed so
+        rx_ok depends on noise, in that case noise should be applied with
+        propagation.fade(prt).
+
+        Links are kept per source node. Links of all source edges are
+        calculated in one vectorized call and kept until source or one of
+        its edge neighbors moves or propagation parameters change, so in
+        mobile networks only links of moved nodes are recalculated. Links
+        between nodes that are not neighbors are calculated and kept on
+        demand.
+
+        """
+        constants = self.propagation.constants()
+        if constants != self._links_stamp:
+            self._links = {}
+            self._links_stamp = constants
+        versions = self.pos.versions
+        version, row = self._links.get(source, (None, {}))
+        entry = row.get(destination)
+        if version == versions[source]:
+            if entry is not None and entry[0] == versions[destination]:
+                return entry[1]
+        else:
+            entry = None
+        if entry is not None or version != versions[source]:
+            # source or its neighbor moved, recalculate links of all edges
+            row = self._link_row(source, Graph.neighbors(self, source))
+            self._links[source] = versions[source], row
+            entry = row.get(destination)
+        if entry is None:
+            row.update(self._link_row(source, [destination]))
+            entry = row[destination]
+        return entry[1]
+
+    def _link_row(self, source, destinations):
+        """ Returns {destination: (version, link)} for links from source. """
+        if not destinations:
+            return {}
+        v = self.pos[source] - self.pos.as_array(destinations)
+        d = sqrt((v * v).sum(axis=1))
+        prt = self.propagation.get_power_ratio_array(d, noise=0)
+        rx_ok = self.propagation.is_rx_ok_array(prt=prt)
+        shadowed = self.propagation.is_shadowed_array(d)
+        versions = self.pos.versions
+        row = {}
+        for i, destination in enumerate(destinations):
+            row[destination] = (versions[destination],
+                                (d[i], prt[i],
+                                 None if shadowed[i] else bool(rx_ok[i])))
+        return row
+
+    @contextmanager
+    def batch_update(self):
+        """
+        Context in which edges are not recalculated on every node change i.e.
+        add_node or commRange change. On exit edges are recalculated once
+        for all changed nodes.
+
+        >>> with net.batch_update():
+        ...     for node in net:
+        ...         node.commRange += 10
+
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                nodes = self._batch_nodes
+                self._batch_nodes = []
+                self._batch_set = set()
+                if nodes is None:
+                    self.recalculate_edges()
+                else:
+                    nodes = [n for n in nodes if n in self]
+                    if nodes:
+                        self.recalculate_edges(nodes)
+
+    def _defer_edges(self, nodes):
+        """ Remember nodes whose edges should be recalculated on exit from
+        batch_update. """
+        if self._batch_nodes is None:
+            return
+        if not nodes:
+            self._batch_nodes = None
+            return
+        for node in nodes:
+            if node not in self._batch_set:
+                self._batch_set.add(node)
+                self._batch_nodes.append(node)
+        if len(self._batch_nodes) >= len(self):
+            self._batch_nodes = None
 
     def recalculate_edges(self, nodes=[]):
         """ Recalculate edges for given nodes or for all self.nodes().
         Edge between nodes n1 and n2 are added if both are
-        ChannelType.in_comm_range of each other"""
+        ChannelType.in_comm_range of each other.
+
+        Only nodes found by spatial index within channel's maximum range of
+        n1 are checked, other edges of n1 are removed. Inside batch_update
+        recalculation is postponed until exit. """
+        if self._batch_depth:
+            self._defer_edges(nodes)
+            return
         if(not nodes):
             nodes = self.nodes()
+            self.pos.reindex()
+        else:
+            self.pos.reindex(nodes)
+        components = self._components
         for n1 in nodes:
-            for n2 in self.nodes():
-                if (n1 != n2):
-                    if (self.channelType.in_updated_comm_range(self, n1, n2)):
-                        Graph.add_edge(self, n1, n2)
-                    elif (Graph.has_edge(self, n1, n2)):
-                        Graph.remove_edge(self, n1, n2)
+            if components is not None:
+                components.add(n1)
+            in_range = set()
+            candidates = self._candidates(n1)
+            mask = self.channelType.in_updated_comm_range_array(self, n1,
+                                                                candidates)
+            for i in mask.nonzero()[0]:
+                n2 = candidates[i]
+                if n2 is not n1:
+                    in_range.add(n2)
+                    Graph.add_edge(self, n1, n2)
+                    if components is not None:
+                        components.union(n1, n2)
+            for n2 in Graph.neighbors(self, n1):
+                if n2 not in in_range:
+                    Graph.remove_edge(self, n1, n2)
+                    components = self._components = None
+
+    def _candidates(self, node):
+        """ Returns list of nodes (including node itself) found by spatial
+        index within channel's maximum range of node. """
+        return self.pos.index.query(self.pos[node],
+                                    self.channelType.max_comm_range(node))
 
     def add_edge(self):
         logger.warn('Edges are auto-calculated from channelType and commRange')
 
+    def remove_edge(self, u, v):
+        Graph.remove_edge(self, u, v)
+        self._components = None
+
+    def is_connected(self):
+        """
+        Returns True if network is connected.
+
+        Connected components are kept in DisjointSet that is updated when
+        edges are added so check is O(1) amortized. After edges are removed
+        components are rebuilt from all edges on next call.
+
+        """
+        if self._components is None or len(self._components) != len(self):
+            self._components = DisjointSet(self.nodes())
+            for n1, n2 in self.edges_iter():
+                self._components.union(n1, n2)
+        return self._components.count == 1
+
     def find_random_pos(self, n=100):
-        """ Returns random position, position is free space in environment if
-         it can find free space in n iterations """
-        while (n > 0):
-            pos = rand(self._environment.dim) * \
-                tuple(reversed(self._environment.im.shape))
-            if self._environment.is_space(pos):
-                break
-            n -= 1
-        return pos
+        """ Returns random position in free space of environment, see
+        Environment.random_space. Parameter n is not used any more, it was
+        number of rejection sampling iterations. """
+        return self._environment.random_space()[0]
 
     def reset_all_nodes(self):
         for node in self.nodes():
             node.reset()
         logger.info('Resetting all nodes.')
 
-    def communicate(self):
-        """Pass all messages from node's outboxes to its neighbors inboxes."""
+    def communicate(self, nodes=None):
+        """Pass all messages from node's outboxes to its neighbors inboxes.
+
+        Only outboxes of given nodes are collected if nodes are given."""
         # Collect messages
-        for node in self.nodes():
+        for node in (self.nodes() if nodes is None else nodes):
             self.outbox.extend(node.outbox)
-            node.outbox = []
+            self.queued_messages -= len(node.outbox)
+            node.outbox = MessageQueue()
         while self.outbox:
-            message = self.outbox.pop(0)
+            message = self.outbox.popleft()
             #print message.data
             if (message.destination == None and message.nexthop == None):
                 # broadcast
@@ -387,7 +864,7 @@ class Network(Graph):
                     pass
             elif (message.destination != None):
                 # Destination is neighbor
-                if (message.source in self.nodes() and
+                if (message.source in self and
                     message.destination in self.neighbors(message.source)):
                     self.send(message.destination, message)
                 elif (self.networkRouting):
@@ -401,7 +878,7 @@ class Network(Graph):
 
 
     def broadcast(self, message):
-        if message.source in self.nodes():
+        if message.source in self:
             neighbors = self.neighbors(message.source)
             for node in neighbors:
                 neighbors_message = message.copy()
@@ -415,8 +892,11 @@ class Network(Graph):
         logger.debug('Sending message from %s to %s (%s).' %
                       (repr(message.source), destination, message.data))
 
-        if destination in self.nodes():
-            destination.push_to_inbox(message)
+        if destination in self:
+            if self.timing is not None:
+                self.timing.deliver(destination, message)
+            else:
+                destination.push_to_inbox(message)
             #if message.source:
                 #message.source.power.decrease_tx_energy(message.message_length())  # TODO
         else:
@@ -428,7 +908,8 @@ class Network(Graph):
 
     def get_size(self):
         """ Returns network width and height based on nodes positions. """
-        return max(self.pos.values(), axis=0) - min(self.pos.values(), axis=0)
+        xy = self.pos.as_array()
+        return xy.max(axis=0) - xy.min(axis=0)
 
     def save_json(self, filename, scale=(1, 1)):
         data = json_graph.node_link_data(self)
@@ -467,6 +948,8 @@ class Network(Graph):
         #print nodes
         data['nodes'] = nodes
         data['links'] = edge_list
+        # ids have changed
+        self._order_nodes()
         with open(filename, 'w') as outfile:
             json.dump(data, outfile, indent=4)
 
@@ -505,7 +988,7 @@ class Network(Graph):
                   'children' in node.memory[treeKey]):
                 nodelist = node.memory[treeKey]['children']
             edgelist.extend([(node, neighbor) for neighbor in nodelist
-                              if neighbor in self.nodes()])
+                              if neighbor in self])
         treeNet = self.copy()
         for e in treeNet.edges():
             if e not in edgelist and (e[1], e[0]) not in edgelist:
@@ -1,9 +1,9 @@
-from networkx import is_connected, Graph
+from networkx import Graph
 from numpy.core.numeric import Inf
 from pymote.network import Network
 from pymote.logger import logger
 from pymote.conf import settings
-from numpy import sign, sqrt, array, pi, sin, cos
+from numpy import sign, sqrt, array, pi, sin, cos, arange
 from pymote.node import Node
 from numpy.random import rand
 from itertools import product
@@ -88,9 +88,8 @@ class NetworkGenerator(object):
         """
         if net is None:
             net = Network(**self.kwargs)
-            for _n in range(self.n_count):
-                node = Node(commRange=self.comm_range, **self.kwargs)
-                net.add_node(node)
+            net.add_nodes([Node(commRange=self.comm_range, **self.kwargs)
+                           for _n in range(self.n_count)])
         else:
             if step>0:
                 if len(net)<self.n_max:
@@ -99,8 +98,9 @@ class NetworkGenerator(object):
                     logger.debug("Added node, number of nodes: %d (%d)"
                                  % (len(net), int(self.n_max)))
                 elif not self.comm_range:
-                    for node in net.nodes():
-                        node.commRange += step
+                    with net.batch_update():
+                        for node in net.nodes():
+                            node.commRange += step
                     logger.debug("Increased commRange to %d"
                                  % node.commRange)
                 else:
@@ -113,17 +113,38 @@ class NetworkGenerator(object):
                 elif not self.comm_range:
                     if abs(step) >= net.nodes()[0].commRange:
                         step /= 4
-                    for node in net:
-                        node.commRange += step
+                    with net.batch_update():
+                        for node in net:
+                            node.commRange += step
                     logger.debug("Decreased commRange to %d"
                                  % net.nodes()[0].commRange)
                 else:
                     return None
         return net
 
+    def _solve_comm_range(self, net):
+        """
+        Sets commRange of all nodes directly to the value that satisfies
+        degree and/or connected conditions.
+
+        If both conditions are given larger of the two commRanges is used.
+        Solution assumes distance threshold channel (i.e. Udg), if conditions
+        are still not satisfied generate_random_network falls back to
+        iterative search.
+
+        """
+        comm_ranges = []
+        if self.degree:
+            comm_ranges.append(net.comm_range_for_degree(self.degree))
+        if self.connected:
+            comm_ranges.append(net.connectivity_comm_range())
+        if comm_ranges:
+            net.set_comm_range(max(comm_ranges))
+            logger.debug("Solved commRange %f" % max(comm_ranges))
+
     def _are_conditions_satisfied(self, net):
         cr = net.nodes()[0].commRange
-        if self.connected and not is_connected(net):
+        if self.connected and not net.is_connected():
             logger.debug("Not connected")
             return round(0.2*cr)
         elif self.degree:
@@ -144,6 +165,19 @@ class NetworkGenerator(object):
         # both connected network and too small degree are needed
         # that is agnostic to actual dimensions of the environment
         steps = [0]
+        if net is None and not self.comm_range:
+            net = Network(**self.kwargs)
+            # edges are calculated only once with solved commRange
+            with net.batch_update():
+                net.add_nodes([Node(commRange=self.comm_range, **self.kwargs)
+                               for _n in range(self.n_count)])
+                self._solve_comm_range(net)
+            steps.append(self._are_conditions_satisfied(net))
+            if steps[-1]==0:
+                w, h = net.environment.im.shape
+                self.area = w*h
+                self.net_density = 1.0 * len(net)/self.area
+                return net
         while True:
             net = self._create_modify_network(net, steps[-1])
             # print "here"
@@ -186,8 +220,9 @@ class NetworkGenerator(object):
                                    for neighbor in net]
             max_distances.append(max(distances))
         min_distance = min(max_distances)
-        for node in net:
-            node.commRange = min_distance+1
+        with net.batch_update():
+            for node in net:
+                node.commRange = min_distance+1
         return net
 
     def generate_homogeneous_network(self, name=None, randomness=0.11):
@@ -207,12 +242,16 @@ class NetworkGenerator(object):
         self.area = w * h
         self.net_density = 1.0 * n/self.area
 
-        positions = generate_mesh_positions(net.environment, n)
-        for i in range(n):
-            pos = array([-1, -1])  # some non space point
-            while(not net.environment.is_space(pos)):
-                pos = positions[i, :n] + (rand(2) - 0.5)*(size*randomness)
-            net.pos[net.nodes()[i]] = pos
+        mesh = generate_mesh_positions(net.environment, n)[:n]
+        # perturbations that are not in free space are drawn again
+        positions = mesh.copy()
+        todo = arange(len(mesh))
+        while len(todo):
+            positions[todo] = mesh[todo] + \
+                (rand(len(todo), 2) - 0.5)*(size*randomness)
+            todo = todo[~net.environment.is_space_array(positions[todo])]
+        for node, pos in zip(net.nodes(), positions):
+            net.pos[node] = pos
         net.recalculate_edges()
         #TODO: this is not intuitive but generate_random network with net
         # given as argument will check if conditions are satisfied and act
@@ -231,20 +270,21 @@ def generate_mesh_positions(env, n):
     d = sqrt(h*w/n)
 
     def get_mesh_pos(d, dx, dy, w, h):
-        return map(lambda (xi, yi): (xi*d+dx, yi*d+dy),
-                   product(range(int(round(w/d))), range(int(round(h/d)))))
+        pos = array(map(lambda (xi, yi): (xi*d+dx, yi*d+dy),
+                        product(range(int(round(w/d))),
+                                range(int(round(h/d))))), dtype=float)
+        pos = pos.reshape(-1, 2)
+        return pos[env.is_space_array(pos)]
     n_mesh = 0
     direction = []
     while True:
-        n_mesh = len([1 for pos in get_mesh_pos(d, 0.5*d, 0.5*d, w, h)
-                      if env.is_space(pos)])
+        n_mesh = len(get_mesh_pos(d, 0.5*d, 0.5*d, w, h))
         direction.append(sign(n-n_mesh))
         if n_mesh==n or \
             (len(direction)>=10 and abs(sum(direction[-3:]))<3 and n_mesh>n):
             break
         d *= sqrt(n_mesh/float(n))
-    return array(tuple(pos for pos in get_mesh_pos(d, 0.5*d, 0.5*d, w, h)
-                       if env.is_space(pos)))
+    return get_mesh_pos(d, 0.5*d, 0.5*d, w, h)
     #TODO: n_mesh could be brought closer to n with modification of dx and dy
     #dx = 0.5*d
     #dy = 0.5*d
@@ -4,13 +4,29 @@ from pymote.conf import settings
 from pymote.mobility import MobilityModel
 from pymote.energy import EnergyModel
 from pymote.propagation import PropagationModel
+from pymote.message import MessageQueue
+from pymote.utils.statbuffer import StatBuffer
 import pdb
 
 import logging
 
-from numpy import sqrt
-
 class Node(object):
+    """
+    Network node.
+
+    Nodes have no instance __dict__, new attributes should be added to
+    __slots__ and per node algorithm data stored in memory. Energy, distance
+    and snr traces are StatBuffers with retention set by
+    settings.STATS_RETENTION.
+
+    """
+
+    __slots__ = ('_compositeSensor', 'network', '_commRange', 'id',
+                 '_inboxDelay', 'type', 'power', 'mobility', 'outbox',
+                 '_inbox', '_status', 'memory', 'energy', 'distance', 'snr',
+                 'n_received', 'n_received_failed_power',
+                 'n_received_failed_loss', 'n_transmitted',
+                 'n_transmitted_failed_power')
 
     cid = 1
 
@@ -34,6 +50,9 @@ class Node(object):
         self.type = node_type or 'N'
         self.power = EnergyModel(power_type=power_type)
         self.mobility = MobilityModel(mobile_type=mobile_type)
+        self.outbox = MessageQueue()
+        self._inbox = MessageQueue()
+        self._status = ''
 
         self.reset()
 
@@ -44,14 +63,39 @@ class Node(object):
     def __deepcopy__(self, memo):
         return self
 
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in Node.__slots__
+                    if hasattr(self, name))
+
+    def __setstate__(self, state):
+        """ Accepts also __dict__ state of nodes pickled before __slots__,
+        with status, list boxes and list traces. """
+        state = dict(state)
+        if 'status' in state:
+            state['_status'] = state.pop('status')
+        for name in ('outbox', '_inbox'):
+            if not isinstance(state.get(name, MessageQueue()), MessageQueue):
+                state[name] = MessageQueue(state[name])
+        for name in ('energy', 'distance', 'snr'):
+            if not isinstance(state.get(name, StatBuffer()), StatBuffer):
+                trace = StatBuffer(settings.STATS_RETENTION,
+                                   settings.STATS_SIZE)
+                for value in state[name]:
+                    trace.append(value)
+                state[name] = trace
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def reset(self):
-        self.outbox = []
-        self._inbox = []
+        self._count_queued(-len(self.outbox) - len(self._inbox))
+        self.outbox = MessageQueue()
+        self._inbox = MessageQueue()
         self.status = ''
         self.memory = {}
-        self.energy = []
-        self.distance = []
-        self.snr = []
+        self.energy = StatBuffer(settings.STATS_RETENTION, settings.STATS_SIZE)
+        self.distance = StatBuffer(settings.STATS_RETENTION,
+                                   settings.STATS_SIZE)
+        self.snr = StatBuffer(settings.STATS_RETENTION, settings.STATS_SIZE)
         self.n_received = 0
         self.n_received_failed_power = 0
         self.n_received_failed_loss = 0
@@ -88,7 +132,8 @@ class Node(object):
                          (self.id, message.data, msg_len))
             m = message.copy()
             m.destination = destination
-            self.outbox.insert(0, m)
+            self.outbox.appendleft(m)
+            self._count_queued(1)
 
     def receive(self):
         """
@@ -106,6 +151,7 @@ class Node(object):
         if self._inbox and not self._inboxDelay:
 
             message = self._inbox.pop()
+            self._count_queued(-1)
             if not message:
                 return message
             msg_len = message.message_length()
@@ -118,13 +164,14 @@ class Node(object):
 
                 if not message.source:
                     message.source = self
-                p1 = self.network.pos[message.source]
-                p2 = self.network.pos[message.destination]
-                d = sqrt(sum(pow(p1 - p2, 2)))
+                propagation = self.network.propagation
+                d, prt, rx_ok = self.network.link(message.source,
+                                                  message.destination)
                 self.distance.append(d)
-                prt = self.network.propagation.get_power_ratio(d=d)
+                if rx_ok is None:
+                    prt = propagation.fade(prt)
+                    rx_ok = propagation.is_rx_ok(prt=prt)
                 self.snr.append(PropagationModel.pw_to_dbm(prt))
-                rx_ok = self.network.propagation.is_rx_ok(d=d, prt=prt)
 
                 logger.debug('Node %d received message %s [%d] - %s m (%s)' %
                              (self.id, message.data, msg_len, d, PropagationModel.pw_to_dbm(prt)))
@@ -136,8 +183,10 @@ class Node(object):
                     self.memory[message.header].append(message.data)
                 else:
                     self.n_received_failed_loss += 1
+                    # new power ratio is drawn as before link table so seeded
+                    # simulations keep the same random stream
                     logger.debug("Receive Failed due to signal loss: %s" %
-                                 self.network.propagation.get_power_ratio(d=d))
+                                 propagation.get_power_ratio(d=d))
             self.energy.append(self.power.energy)
         else:
             message = None
@@ -149,14 +198,32 @@ class Node(object):
     def inbox(self):
         return self._inbox
 
-    def push_to_inbox(self, message):
-        # TODO: for optimization remove _inboxDelay when not visualizing
-
-        #pdb.set_trace()
-        self._inboxDelay = self._inboxDelay or not self._inbox
-        self._inbox.insert(0, message)
+    def push_to_inbox(self, message, delay=True):
+        """ Push message to inbox, with delay=False message can be received
+        in the same step. """
+        self._inboxDelay = delay and (self._inboxDelay or not self._inbox)
+        self._inbox.appendleft(message)
+        self._count_queued(1)
+        if self.network is not None:
+            self.network.inbox_nodes.add(self)
         # print "Got" + str(len(self._inbox)) + str(self._inboxDelay)
 
+    def _count_queued(self, n):
+        """ Update number of messages queued in network, see is_halted. """
+        if self.network is not None:
+            self.network.queued_messages += n
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, status):
+        if self.network is not None and status != self._status:
+            self.network.status_counts[self._status] -= 1
+            self.network.status_counts[status] += 1
+        self._status = status
+
     @property
     def compositeSensor(self):
         return self._compositeSensor
@@ -0,0 +1,236 @@
+"""
+Array backed storage of node positions and orientations.
+
+:class:`NodeStore` keeps positions of all network nodes in one N x 2 float64
+array and orientations in one N array, so distances and range checks over
+many nodes can be calculated with single NumPy operations. Algorithms and
+examples access it through dictionary like views ``net.pos`` and ``net.ori``:
+
+>>> net.pos[node] = array([10., 20.])
+>>> net.pos.distances(node, net.neighbors(node))
+array([ 0.  ,  12.4,  35.7])
+
+"""
+from collections import MutableMapping
+from numpy import empty, nan, sqrt, array
+
+from pymote.spatialindex import GridIndex
+
+
+class NodeStore(object):
+    """
+    Structure of arrays with positions and orientations of nodes.
+
+    Every stored node has a stable row `row[node]` in `xy` and `theta` arrays.
+    Row of removed node is filled with the last row so valid rows are always
+    ``[:len(store)]``. Position or orientation that is not set is nan.
+
+    """
+
+    def __init__(self, capacity=64):
+        self.xy = empty((capacity, 2))
+        self.xy.fill(nan)
+        self.theta = empty(capacity)
+        self.theta.fill(nan)
+        self.row = {}
+        self.nodes = []
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return node in self.row
+
+    def add(self, node):
+        """ Return row of node, new row is appended if node is not stored. """
+        try:
+            return self.row[node]
+        except KeyError:
+            pass
+        n = len(self.nodes)
+        if n == len(self.theta):
+            self._grow(2 * n)
+        self.xy[n] = nan
+        self.theta[n] = nan
+        self.row[node] = n
+        self.nodes.append(node)
+        return n
+
+    def discard(self, node):
+        """ Remove node row if both its position and orientation are unset. """
+        row = self.row.get(node, None)
+        if row is None or self.xy[row, 0] == self.xy[row, 0] or \
+                self.theta[row] == self.theta[row]:
+            return
+        del self.row[node]
+        last = self.nodes.pop()
+        if last is not node:
+            n = len(self.nodes)
+            self.xy[row] = self.xy[n]
+            self.theta[row] = self.theta[n]
+            self.nodes[row] = last
+            self.row[last] = row
+
+    def _grow(self, capacity):
+        n = len(self.nodes)
+        xy = empty((capacity, 2))
+        xy.fill(nan)
+        xy[:n] = self.xy[:n]
+        theta = empty(capacity)
+        theta.fill(nan)
+        theta[:n] = self.theta[:n]
+        self.xy = xy
+        self.theta = theta
+
+    def rows(self, nodes):
+        """ Return array of rows for given nodes. """
+        row = self.row
+        return array([row[node] for node in nodes], dtype=int)
+
+
+class _NodeStoreView(MutableMapping):
+    """ Base class for dictionary views {node: value} into NodeStore. """
+
+    def __init__(self, store):
+        self.store = store
+        self._count = 0
+
+    def _is_set(self, row):
+        raise NotImplementedError
+
+    def _set(self, row, value):
+        raise NotImplementedError
+
+    def _unset(self, row):
+        raise NotImplementedError
+
+    def _row(self, node):
+        row = self.store.row.get(node, None)
+        if row is None or not self._is_set(row):
+            raise KeyError(node)
+        return row
+
+    def __contains__(self, node):
+        row = self.store.row.get(node, None)
+        return row is not None and self._is_set(row)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        row = self.store.row
+        return iter([node for node in self.store.nodes
+                     if self._is_set(row[node])])
+
+    def __setitem__(self, node, value):
+        row = self.store.add(node)
+        if not self._is_set(row):
+            self._count += 1
+        self._set(row, value)
+
+    def __delitem__(self, node):
+        row = self._row(node)
+        self._unset(row)
+        self._count -= 1
+        self.store.discard(node)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class NodePositions(_NodeStoreView):
+    """
+    Dictionary like view of node positions {node: array([x, y])} that keeps
+    its :class:`GridIndex` up to date when positions are set or deleted.
+
+    Returned positions are copies so positions should be assigned as a whole,
+    i.e. ``net.pos[node] = pos`` or ``net.pos[node] += (dx, dy)``.
+
+    Attribute `version` is incremented on every change so that data derived
+    from positions (i.e. cached neighbors) can be invalidated. Attribute
+    `versions` {node: version} keeps version of last change of each node
+    position so that data derived from positions of few nodes (i.e. cached
+    links) is invalidated only when these nodes move.
+
+    """
+
+    def __init__(self, store, cell_size):
+        super(NodePositions, self).__init__(store)
+        self.index = GridIndex(cell_size)
+        self.version = 0
+        self.versions = {}
+
+    def _is_set(self, row):
+        return self.store.xy[row, 0] == self.store.xy[row, 0]
+
+    def _set(self, row, pos):
+        self.store.xy[row] = pos[0], pos[1]
+
+    def _unset(self, row):
+        self.store.xy[row] = nan
+
+    def __getitem__(self, node):
+        return self.store.xy[self._row(node)].copy()
+
+    def __setitem__(self, node, pos):
+        super(NodePositions, self).__setitem__(node, pos)
+        self.index.insert(node, pos)
+        self.version += 1
+        self.versions[node] = self.version
+
+    def __delitem__(self, node):
+        super(NodePositions, self).__delitem__(node)
+        self.index.remove(node)
+        self.version += 1
+        del self.versions[node]
+
+    def reindex(self, nodes=None):
+        """ Refresh index entries for given nodes or rebuild whole index. """
+        self.version += 1
+        if nodes is None:
+            self.index.rebuild(self)
+            nodes = self
+        else:
+            for node in nodes:
+                self.index.insert(node, self[node])
+        for node in nodes:
+            self.versions[node] = self.version
+
+    def as_array(self, nodes=None):
+        """ Return positions of given nodes (default: all) as N x 2 array. """
+        if nodes is None:
+            nodes = list(self)
+        return self.store.xy[self.store.rows(nodes)]
+
+    def distance(self, node1, node2):
+        xy = self.store.xy
+        dx, dy = xy[self._row(node1)] - xy[self._row(node2)]
+        return sqrt(dx * dx + dy * dy)
+
+    def distances(self, node, nodes):
+        """ Return array of distances from node to each of given nodes. """
+        if not len(nodes):
+            return empty(0)
+        v = self.as_array(nodes) - self.store.xy[self._row(node)]
+        return sqrt((v * v).sum(axis=1))
+
+
+class NodeOrientations(_NodeStoreView):
+    """ Dictionary like view of node orientations {node: theta}. """
+
+    def _is_set(self, row):
+        return self.store.theta[row] == self.store.theta[row]
+
+    def _set(self, row, theta):
+        self.store.theta[row] = theta
+
+    def _unset(self, row):
+        self.store.theta[row] = nan
+
+    def __getitem__(self, node):
+        return self.store.theta[self._row(node)]
+
+    def as_array(self, nodes=None):
+        if nodes is None:
+            nodes = list(self)
+        return self.store.theta[self.store.rows(nodes)]
@@ -1,5 +1,5 @@
 from pymote.logger import logger
-from numpy import sqrt, pi, sin, cos, log10
+from numpy import sqrt, pi, sin, cos, log10, asarray, full, maximum
 from numpy.random import normal
 
 
@@ -28,6 +28,8 @@ class PropagationModel(object):
 
     P_TX = 1.0  # Watts
 
+    _constants_key = None  # see _free_space_gain
+
     def __init__(self, propagation_type=0, node_type=None, **kwargs):
         """
         Initialize the node object.
@@ -39,6 +41,7 @@ class PropagationModel(object):
         """
         self.type = node_type or 'N'
         self.propagation_type = propagation_type
+        self._constants_key = None
 
     def __repr__(self):
         return "<Propagation Type=%s>" % (Propagation_Type[self.propagation_type])
@@ -183,7 +186,7 @@ class PropagationModel(object):
 
         if self.propagation_type == 1 and \
            d > self.cross_over_distance(h_tx, h_rx):
-            prt = self.two_ray_ground(d, h_tx, h_rx, p_tx)
+            prt = self.two_ray_ground(d, p_tx, h_tx, h_rx)
         elif self.propagation_type == 2:
             prt = self.shadowing(d, p_tx)
         else:
@@ -198,3 +201,115 @@ class PropagationModel(object):
             prt = self.get_power_ratio(h_tx, h_rx, d, p_tx)
         prt_dbm = PropagationModel.pw_to_dbm(prt)
         return prt_dbm >= self.P_RX_THRESHOLD
+
+    def constants(self):
+        """ Returns tuple of all parameters that received power depends on,
+        used to invalidate data derived from them, i.e. network link table.
+        """
+        return (self.propagation_type, self.C, self.FREQ, self.G_TX,
+                self.G_RX, self.L, self.BETA, self.SIGMA_DB, self.REF_DIST,
+                self.P_RX_THRESHOLD, self.MAX_DISTANCE_NO_LOSS, self.P_TX)
+
+    # Batch versions take array of distances and return array of results,
+    # i.e. for all links in network or all deliveries in one step.
+
+    def _free_space_gain(self):
+        """
+        Returns Gt * Gr * (lambda / (4 * pi))^2 / L, free space received
+        power ratio at distance 1m without transmit power. It is calculated
+        once and recalculated only if class constants are changed.
+        """
+        key = (self.C, self.FREQ, self.G_TX, self.G_RX, self.L)
+        if self._constants_key != key:
+            wavelength = self.C/self.FREQ
+            self._gain = self.G_RX * self.G_TX * \
+                (wavelength/(4 * pi)) ** 2 / max(self.L, 1.0)
+            self._constants_key = key
+        return self._gain
+
+    def free_space_array(self, d, p_tx=None):
+        """ Friis free space received power for array of distances. """
+        p_tx = p_tx or PropagationModel.P_TX
+        d = asarray(d, dtype=float)
+        return p_tx * self._free_space_gain() / (d * d)
+
+    def two_ray_ground_array(self, d, p_tx=None, h_tx=1.0, h_rx=1.0):
+        """ Two-ray ground received power for array of distances. """
+        p_tx = p_tx or PropagationModel.P_TX
+        d = maximum(asarray(d, dtype=float), 1.0)
+        m = h_rx * h_tx/(d * d)
+        return p_tx * self.G_RX * self.G_TX * m * m / max(self.L, 1.0)
+
+    def _shadowing_db_array(self, d, p_tx, noise):
+        """ Received power in dBm for array of distances, noise in dB is
+        drawn in one call if not given. """
+        d0 = PropagationModel.REF_DIST
+        d = asarray(d, dtype=float)
+        pr0 = p_tx * self._free_space_gain() / (d0 * d0)
+        if noise is None:
+            noise = normal(0, self.SIGMA_DB, d.shape)
+        p_loss_db = -10.0 * self.BETA * log10(d/d0) + noise
+        return PropagationModel.pw_to_dbm(pr0) + p_loss_db
+
+    def shadowing_array(self, d, p_tx=None, noise=None):
+        """
+        Shadowing received power (Watts) for array of distances.
+
+        :param noise: Gaussian variation in dB for each distance, if None it
+            is drawn with standard deviation SIGMA_DB, use 0 for mean power
+        """
+        p_tx = p_tx or PropagationModel.P_TX
+        return PropagationModel.dbm_to_pw(
+            self._shadowing_db_array(d, p_tx, noise))
+
+    def shadowing_rssi_array(self, d, p_tx=None, noise=None):
+        """ Shadowing received power in dBm for array of distances. """
+        p_tx = p_tx or PropagationModel.P_TX
+        return self._shadowing_db_array(d, p_tx, noise)
+
+    def get_power_ratio_array(self, d, h_tx=1.0, h_rx=1.0, p_tx=None,
+                              noise=None):
+        """
+        Batch version of get_power_ratio.
+
+        :param d: array of distances
+        :param noise: shadowing noise in dB, see shadowing_array
+        :return: array of received power ratios
+        """
+        p_tx = p_tx or PropagationModel.P_TX
+        d = asarray(d, dtype=float)
+        prt = full(d.shape, float(p_tx))
+        loss = d > self.MAX_DISTANCE_NO_LOSS
+        if noise is not None and asarray(noise).ndim:
+            noise = asarray(noise)[loss]
+        if self.propagation_type == 1:
+            two_ray = loss & (d > self.cross_over_distance(h_tx, h_rx))
+            prt[two_ray] = self.two_ray_ground_array(d[two_ray], p_tx,
+                                                     h_tx, h_rx)
+            loss &= ~two_ray
+            prt[loss] = self.free_space_array(d[loss], p_tx)
+        elif self.propagation_type == 2:
+            prt[loss] = self.shadowing_array(d[loss], p_tx, noise)
+        else:
+            prt[loss] = self.free_space_array(d[loss], p_tx)
+        return prt
+
+    def is_shadowed_array(self, d):
+        """ Returns boolean array, True where received power is random
+        i.e. varies by shadowing noise. """
+        d = asarray(d, dtype=float)
+        return (d > self.MAX_DISTANCE_NO_LOSS) & (self.propagation_type == 2)
+
+    def fade(self, prt, size=None):
+        """ Returns mean received power ratio prt (shadowing with noise=0)
+        with Gaussian shadowing noise applied, size draws noise for array of
+        power ratios in one call. """
+        return prt * 10 ** (normal(0, self.SIGMA_DB, size)/10.0)
+
+    def is_rx_ok_array(self, d=None, h_tx=1.0, h_rx=1.0, p_tx=None,
+                       prt=None):
+        """ Batch version of is_rx_ok, returns boolean array. """
+        if prt is None:
+            prt = self.get_power_ratio_array(d, h_tx, h_rx, p_tx)
+        return PropagationModel.pw_to_dbm(asarray(prt)) >= \
+            self.P_RX_THRESHOLD
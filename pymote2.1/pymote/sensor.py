@@ -22,10 +22,27 @@ To manually set sensor parameters first make an sensor instance:
 >>> aoa_sensor = AoASensor({'pf': scipy.stats.norm, 'scale': 10*pi/180 })
 >>> node.compositeSensor = (aoa_sensor,)
 
+Sensors of all nodes in network can be read in bulk, for AoA and distance
+measurements of all neighbor pairs are calculated in one vectorized pass:
+
+>>> readings = read_sensors(net)
+>>> readings[node]['AoA']
+
+Noise for all neighbors of a node is drawn in one call. For many small reads
+noise can be drawn in advance in pools and from seeded random state that is
+shared by sensors with the same seed:
+
+>>> aoa_sensor = AoASensor({'pf': scipy.stats.norm, 'scale': 10*pi/180,
+...                         'pool_size': 10000, 'seed': 1})
+>>> reset_noise_streams()  # repeat the same noise
+
 """
 
 from pymote.conf import settings
-from numpy import arctan2, pi, sqrt
+from numpy import arctan2, pi, asarray, empty, concatenate, cumsum, sqrt, \
+    array, repeat
+from numpy.random import RandomState
+from itertools import izip
 import inspect
 
 
@@ -43,7 +60,7 @@ class Sensor(object):
     pf_settings_key = ''
 
     def __init__(self, pf_params={}):
-        pf_params_final = getattr(settings, self.pf_settings_key, {})
+        pf_params_final = dict(getattr(settings, self.pf_settings_key, {}))
         pf_params_final.update(pf_params)
         if pf_params_final:
             self.probabilityFunction = ProbabilityFunction(**pf_params_final)
@@ -57,6 +74,20 @@ class Sensor(object):
         """This method should be overriden in subclass."""
         pass
 
+    def bulk_key(self):
+        """ Sensors with the same key give equally distributed readings
+        from the same noise stream so they are read together in
+        read_sensors. """
+        pf = getattr(self, 'probabilityFunction', None)
+        if pf is None:
+            return (self.__class__,)
+        return (self.__class__, pf.pf, pf.scale, pf.pool_size, pf.seed)
+
+    def read_many(self, network, nodes):
+        """ Returns list of readings of given nodes as if their sensor was
+        this one, override for vectorized reading. """
+        return [self.read(node) for node in nodes]
+
 
 def node_in_network(fun):
     """Decorator function that checks if node is in network."""
@@ -77,42 +108,90 @@ class NeighborsSensor(Sensor):
         return {'Neighbors': node.network.neighbors(node)}
 
 
-class AoASensor(Sensor):
+class NeighborMeasurementSensor(Sensor):
+
+    """
+    Base class for sensors that measure value for each neighbor, subclasses
+    define measure() for arrays of node pairs.
+    """
+
+    key = ''
+
+    def values(self, v, ori):
+        """ Returns array of measured values without noise for N x 2 array
+        of vectors v from nodes to their neighbors and orientations ori of
+        nodes. """
+        raise NotImplementedError
+
+    def measure(self, network, sources, destinations):
+        """ Returns array of noisy measurements for pairs of nodes, i.e.
+        for all edges of network as compact edge indexed array. """
+        v = network.pos.as_array(destinations) - network.pos.as_array(sources)
+        return self.probabilityFunction.getNoisyReadings(
+            self.values(v, network.ori.as_array(sources)))
+
+    def read_many(self, network, nodes):
+        neighbors = [network.neighbors(node) for node in nodes]
+        counts = array([len(n) for n in neighbors], dtype=int)
+        destinations = [n for node_neighbors in neighbors
+                        for n in node_neighbors]
+        if destinations:
+            v = network.pos.as_array(destinations) - \
+                repeat(network.pos.as_array(nodes), counts, axis=0)
+            ori = repeat(network.ori.as_array(nodes), counts)
+            values = self.probabilityFunction.getNoisyReadings(
+                self.values(v, ori)).tolist()
+        else:
+            values = []
+        ends = cumsum(counts).tolist()
+        return [{self.key: dict(izip(node_neighbors,
+                                     values[end - count:end]))}
+                for node_neighbors, count, end in izip(neighbors,
+                                                       counts.tolist(), ends)]
+
+
+class AoASensor(NeighborMeasurementSensor):
 
     """Provides azimuth between node and its neighbors."""
 
     pf_settings_key = 'AOA_PF_PARAMS'
+    key = 'AoA'
+
+    def values(self, v, ori):
+        return (arctan2(v[:, 1], v[:, 0]) - ori) % (2 * pi)
 
     @node_in_network
     def read(self, node):
         network = node.network
         measurements = {}
-        p = network.pos[node]
-        o = network.ori[node]
-        for neighbor in network.neighbors(node):
-            v = network.pos[neighbor] - p
-            measurement = (arctan2(v[1], v[0]) - o) % (2 * pi)
-            measurement = self.probabilityFunction.getNoisyReading(measurement)
-            measurements.update({neighbor: measurement})
+        neighbors = network.neighbors(node)
+        if not neighbors:
+            return {'AoA': measurements}
+        v = network.pos.as_array(neighbors) - network.pos[node]
+        azimuths = (arctan2(v[:, 1], v[:, 0]) - network.ori[node]) % (2 * pi)
+        azimuths = self.probabilityFunction.getNoisyReadings(azimuths)
+        measurements.update(zip(neighbors, azimuths))
         return {'AoA': measurements}
 
 
-class DistSensor(Sensor):
+class DistSensor(NeighborMeasurementSensor):
 
     """Provides distance between node and its neighbors."""
 
     pf_settings_key = 'DIST_PF_PARAMS'
+    key = 'Dist'
+
+    def values(self, v, ori):
+        return sqrt((v * v).sum(axis=1))
 
     @node_in_network
     def read(self, node):
         network = node.network
         measurements = {}
-        p = network.pos[node]
-        for neighbor in network.neighbors(node):
-            pn = network.pos[neighbor]
-            measurement = sqrt(sum(pow(p - pn, 2)))
-            measurement = self.probabilityFunction.getNoisyReading(measurement)
-            measurements.update({neighbor: measurement})
+        neighbors = network.neighbors(node)
+        distances = network.pos.distances(node, neighbors)
+        distances = self.probabilityFunction.getNoisyReadings(distances)
+        measurements.update(zip(neighbors, distances))
         return {'Dist': measurements}
 
 
@@ -125,6 +204,15 @@ class TruePosSensor(Sensor):
         return {'TruePos': node.network.pos[node]}
 
 
+def _subclasses(cls):
+    """ Returns all subclasses of cls in depth first order. """
+    subclasses = []
+    for subclass in cls.__subclasses__():
+        subclasses.append(subclass)
+        subclasses.extend(_subclasses(subclass))
+    return subclasses
+
+
 class CompositeSensor(object):
 
     """
@@ -157,7 +245,7 @@ class CompositeSensor(object):
     def sensors(self, sensors):
         self._sensors = ()
         # instantiate sensors passed by class name
-        for cls in Sensor.__subclasses__():
+        for cls in _subclasses(Sensor):
             if (cls.__name__ in sensors):
                 self._sensors += cls(),
         # instantiate sensors passed by class
@@ -183,18 +271,136 @@ class CompositeSensor(object):
         return measurements
 
 
+def read_sensors(network, nodes=None):
+    """
+    Read composite sensors of given nodes (default: all network nodes) and
+    return {node: readings} where readings are the same as from
+    node.compositeSensor.read().
+
+    Sensors of the same type and with the same probability function are
+    read for all nodes together with Sensor.read_many, so i.e. AoA and
+    distance are measured for all neighbor pairs in one vectorized pass and
+    noise for them is drawn in one call.
+    """
+    nodes = network.nodes() if nodes is None else nodes
+    groups = {}
+    order = []
+    node_keys = []
+    for node in nodes:
+        if not node.network:
+            raise Exception('Cannot take a sensor reading if node is'
+                            ' outside of a network.')
+        keys = [sensor.bulk_key() for sensor in node.compositeSensor.sensors]
+        for sensor, key in zip(node.compositeSensor.sensors, keys):
+            if key not in groups:
+                groups[key] = (sensor, [])
+                order.append(key)
+            groups[key][1].append(node)
+        node_keys.append(keys)
+    results = {}
+    for key in order:
+        sensor, group_nodes = groups[key]
+        results[key] = dict(izip(group_nodes,
+                                 sensor.read_many(network, group_nodes)))
+    readings = {}
+    for node, keys in izip(nodes, node_keys):
+        measurements = {}
+        for key in keys:
+            measurements.update(results[key][node])
+        readings[node] = measurements
+    return readings
+
+
+# Seeded noise streams shared by all probability functions with the same
+# seed, and pools of standard noise shared by those with the same pf,
+# pool_size and seed.
+_random_states = {}
+_pools = {}
+
+
+def reset_noise_streams():
+    """ Restart seeded noise streams and discard pooled noise so noise is
+    repeated i.e. when experiment is repeated in the same process. """
+    for seed, random_state in _random_states.items():
+        random_state.seed(seed)
+    _pools.clear()
+
+
 class ProbabilityFunction(object):
 
     """Provides a way to get noisy reading."""
 
-    def __init__(self, scale, pf):
+    def __init__(self, scale, pf, pool_size=0, seed=None):
         """
         pf: probability function (i.e. :py:data:`scipy.stats.norm`)
         scale: pf parameter
+        pool_size: if > 0 standard noise (loc=0, scale=1) is drawn in advance
+            in chunks of pool_size and readings are value + scale * noise
+        seed: seed of random state shared by all probability functions with
+            the same seed (i.e. sensors of all nodes) so noise is independent
+            between nodes, by default numpy global random state is used so
+            readings are reproducible with numpy.random.seed
         """
         self.pf = pf  # class or gen object
         self.name = self.pf.__class__.__name__
         self.scale = scale
+        self.pool_size = pool_size
+        self.seed = seed
+        self._set_random_state()
+
+    def _set_random_state(self):
+        if self.seed is None:
+            self.random_state = None
+        else:
+            if self.seed not in _random_states:
+                _random_states[self.seed] = RandomState(self.seed)
+            self.random_state = _random_states[self.seed]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['random_state']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._set_random_state()
+
+    def _rvs(self, loc=0., scale=1., size=None):
+        """ Draw from pf with own random state if seeded, by inversion of
+        uniform samples as rvs does not take random state in all scipy
+        versions. """
+        if self.random_state is None:
+            return self.pf.rvs(loc=loc, scale=scale, size=size)
+        return self.pf.ppf(self.random_state.random_sample(size), loc=loc,
+                           scale=scale)
 
     def getNoisyReading(self, value):
-        return self.pf.rvs(scale=self.scale, loc=value)
+        if self.pool_size:
+            return value + self.scale * self._draw(1)[0]
+        return self._rvs(scale=self.scale, loc=value)
+
+    def getNoisyReadings(self, values):
+        """
+        Returns array of noisy readings for array of values.
+
+        Noise is drawn in one call, without pool readings are the same as
+        from getNoisyReading called for each value in order.
+        """
+        values = asarray(values, dtype=float)
+        if not values.size:
+            return values.copy()
+        if self.pool_size:
+            return values + self.scale * self._draw(values.size).reshape(
+                values.shape)
+        return self._rvs(scale=self.scale, loc=values, size=values.shape)
+
+    def _draw(self, n):
+        """ Returns n standard noise values from shared pool, pool is
+        refilled with at least pool_size values when it runs out. """
+        key = (self.pf, self.pool_size, self.seed)
+        pool = _pools.get(key, empty(0))
+        if len(pool) < n:
+            fill = self._rvs(size=max(self.pool_size, n - len(pool)))
+            pool = concatenate((pool, fill))
+        _pools[key] = pool[n:]
+        return pool[:n]
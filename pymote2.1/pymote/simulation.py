@@ -1,27 +1,54 @@
-from PySide.QtCore import QThread, SIGNAL
 import pdb
 import logging
 import datetime
 from pymote.network import Network
 from pymote.algorithm import NetworkAlgorithm
 from pymote.algorithm import NodeAlgorithm
+from pymote.timing import TimingModel
 
-class Simulation(QThread):
+
+class SimulationObserver(object):
+    """
+    Base class for objects that follow simulation progress, i.e. GUI.
+
+    Observers are attached with HeadlessSimulation.add_observer and their
+    methods are called with simulation as first argument.
+
+    """
+
+    def redraw(self, simulation):
+        """ Called after each algorithm run and when network is changed. """
+        pass
+
+    def update_log(self, simulation, text):
+        pass
+
+
+class HeadlessSimulation(object):
     """ Controls single network algorithm and node algorithms simulation.
-        It is responsible for visualization and logging, also. """
+        It is responsible for logging and notifying observers, it does not
+        depend on Qt so it can be used for batch runs. """
 
-    def __init__(self, network, logLevel=None, **kwargs):
+    def __init__(self, network, logLevel=None, observers=(), **kwargs):
         assert(isinstance(network, Network))
         self._network = network
         self.sim_start = self.sim_end = None
         self.stepsLeft = 0
+        self.observers = list(observers)
         self.logger = logging.getLogger('pymote.simulation')
         self.logger.level = logLevel or logging.DEBUG
-        QThread.__init__(self)
 
-    def __del__(self):
-        self.exiting = True
-        self.wait()
+    def add_observer(self, observer):
+        if observer not in self.observers:
+            self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def notify(self, event, *args):
+        """ Call observers method event i.e. 'redraw' or 'update_log'. """
+        for observer in self.observers:
+            getattr(observer, event)(self, *args)
 
     def run_all(self, stepping=False):
         """ Run simulation form beginning. """
@@ -52,10 +79,10 @@ class Simulation(QThread):
             algorithm = self.network.get_current_algorithm()
             if not algorithm:
                 self.sim_end = datetime.datetime.utcnow()
-                self.emit(SIGNAL('redraw()'))
+                self.notify('redraw')
                 break
             self.run_algorithm(algorithm)
-            self.emit(SIGNAL('redraw()'))
+            self.notify('redraw')
             if self.stepsLeft >= 0:
                 break
 
@@ -65,6 +92,10 @@ class Simulation(QThread):
 
         Update stepsLeft and network.algorithmState['step'].
         If stepsLeft hit 0 it may return unfinished.
+        In each step only nodes with messages in inbox are stepped, in order
+        of their ids, unless algorithm.always_step is set. If no node has
+        messages but simulation is not halted (i.e. nodes are LISTENING and
+        count timers in step) all nodes are stepped.
         """
         if isinstance(algorithm, NetworkAlgorithm):
             self.stepsLeft -= 1
@@ -75,8 +106,14 @@ class Simulation(QThread):
             while not self.is_halted():
                 self.stepsLeft -= 1
                 self.network.communicate()
-                for node in self.network.nodes():
-                    nodeTerminated = algorithm.step(node)
+                if algorithm.always_step:
+                    nodes = self.network.nodes()
+                else:
+                    nodes = self.network.active_nodes() or \
+                        self.network.nodes()
+                nodeTerminated = False
+                for node in nodes:
+                    nodeTerminated = algorithm.step(node) or nodeTerminated
                 self.network.algorithmState['step'] += 1
                 if nodeTerminated:
                     break
@@ -92,25 +129,19 @@ class Simulation(QThread):
         self.logger.info('Resetting simulation.')
         self._network.reset()
 
-    # Modified the is_halted method for delaying algorithm
     def is_halted(self):
         """ Check if distributed algorithm have come to end or deadlock
             i.e. no messages to pass.
+
+        Messages and node statuses are counted by network so check does not
+        iterate over nodes. Algorithm specific termination condition can be
+        declared by overriding NodeAlgorithm.is_terminated.
         """
-        try:
-            base_station = self.network.nodes()[100]
-            if base_station.status == "DONE":
-                print base_station.memory["aggregate_data"]
-                return True
-        except Exception as e:
-            pass
-        if len(self._network.outbox) > 0 or \
-           any([len(node.outbox) for node in self.network.nodes()]) or \
-           any([len(node.inbox) for node in self.network.nodes()]) or \
-           "LISTENING" in [node.status for node in self.network.nodes()]:
-            return False
-        else:
+        algorithm = self.network.get_current_algorithm()
+        if isinstance(algorithm, NodeAlgorithm) and algorithm.is_terminated():
             return True
+        return not (self._network.outbox or self._network.queued_messages or
+                    self._network.status_counts['LISTENING'])
 
     @property
     def network(self):
@@ -121,5 +152,76 @@ class Simulation(QThread):
         self._network.simulation = None
         self._network = network
         self._network.simulation = self
-        self.emit(SIGNAL('updateLog(QString)'), 'Network loaded')
-        self.emit(SIGNAL('redraw()'))
+        self.notify('update_log', 'Network loaded')
+        self.notify('redraw')
+
+
+class EventSimulation(HeadlessSimulation):
+    """
+    Event driven simulation of node algorithms.
+
+    Instead of synchronous rounds messages are delivered after latency
+    given by TimingModel and every delivery or timer is processed as a
+    single event by algorithm STATUS functions, so simulation time is
+    proportional to the number of events. Steps count events and clock is
+    available as network.timing.time during run.
+
+    """
+
+    def __init__(self, network, timing=None, **kwargs):
+        self.timing = timing or TimingModel()
+        super(EventSimulation, self).__init__(network, **kwargs)
+
+    def run_algorithm(self, algorithm):
+        """
+        Run given algorithm on given network.
+
+        Update stepsLeft and network.algorithmState['step'].
+        If stepsLeft hit 0 it may return unfinished.
+        """
+        if isinstance(algorithm, NodeAlgorithm):
+            self.network.timing = self.timing
+            try:
+                if not self._run_events(algorithm):
+                    return  # not finished
+            finally:
+                self.network.timing = None
+            self.network.algorithmState['finished'] = True
+        else:
+            super(EventSimulation, self).run_algorithm(algorithm)
+
+    def _run_events(self, algorithm):
+        """ Process events until there are none left, returns False if
+        stopped by stepsLeft. """
+        if self.network.algorithmState['step'] == 1:
+            self.timing.clear()
+            algorithm.initializer()
+            self.network.communicate()
+        while not algorithm.is_terminated():
+            event = self.timing.pop()
+            if event is None:
+                break
+            node, message, timer = event
+            if node not in self.network:
+                continue
+            self.stepsLeft -= 1
+            if timer is None:
+                node.push_to_inbox(message, delay=False)
+                nodeTerminated = algorithm.step(node)
+            else:
+                nodeTerminated = algorithm._process_message(node, message)
+            self.network.communicate([node])
+            self.network.algorithmState['step'] += 1
+            if nodeTerminated:
+                break
+            if self.stepsLeft == 0:
+                return False
+        return True
+
+    def reset(self):
+        super(EventSimulation, self).reset()
+        self.timing.reset()
+
+
+# Simulation no longer is a QThread, GUI attaches its observer to it
+Simulation = HeadlessSimulation
@@ -0,0 +1,93 @@
+from numpy import floor
+
+
+class GridIndex(object):
+    """
+    Uniform grid over node positions used for fixed radius neighbor search.
+
+    Space is divided into square cells of size `cell_size` and each node is
+    kept in the cell its position falls into. Query returns all nodes from the
+    cells overlapping the square around given position so it is a superset of
+    nodes within given radius, exact check is left to the channel type.
+    Nodes in cell are kept in insertion order so query results (and random
+    draws made for them) do not depend on node hashes.
+
+    Basic usage:
+
+    >>> index = GridIndex(cell_size=100)
+    >>> index.insert(node, (10, 20))
+    >>> index.query((0, 0), radius=50)
+    [<Node id=1>]
+
+    """
+
+    def __init__(self, cell_size):
+        assert cell_size > 0
+        self.cell_size = float(cell_size)
+        self._cells = {}
+        self._node_cell = {}
+
+    def __len__(self):
+        return len(self._node_cell)
+
+    def __contains__(self, node):
+        return node in self._node_cell
+
+    def _cell(self, pos):
+        return (int(floor(pos[0] / self.cell_size)),
+                int(floor(pos[1] / self.cell_size)))
+
+    def insert(self, node, pos):
+        """ Insert node at given position or move it if already indexed. """
+        cell = self._cell(pos)
+        old_cell = self._node_cell.get(node, None)
+        if old_cell == cell:
+            return
+        if old_cell is not None:
+            self._discard(node, old_cell)
+        self._cells.setdefault(cell, []).append(node)
+        self._node_cell[node] = cell
+
+    move = insert
+
+    def remove(self, node):
+        cell = self._node_cell.pop(node, None)
+        if cell is not None:
+            self._discard(node, cell)
+
+    def _discard(self, node, cell):
+        bucket = self._cells[cell]
+        bucket.remove(node)
+        if not bucket:
+            del self._cells[cell]
+
+    def clear(self):
+        self._cells = {}
+        self._node_cell = {}
+
+    def rebuild(self, pos):
+        """ Reindex all nodes from `pos` dictionary {node: position}. """
+        self.clear()
+        for node, p in pos.items():
+            self.insert(node, p)
+
+    def query(self, pos, radius):
+        """ Return nodes in cells that overlap square of given radius around
+        position pos. """
+        i0, j0 = self._cell((pos[0] - radius, pos[1] - radius))
+        i1, j1 = self._cell((pos[0] + radius, pos[1] + radius))
+        candidates = []
+        cells = self._cells
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(cells):
+            # radius covers more cells than are occupied
+            for (i, j), bucket in cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    candidates.extend(bucket)
+            return candidates
+        for i in xrange(i0, i1 + 1):
+            for j in xrange(j0, j1 + 1):
+                bucket = cells.get((i, j), None)
+                if bucket:
+                    candidates.extend(bucket)
+        return candidates
+
@@ -0,0 +1,162 @@
+import os
+import shutil
+import tempfile
+import unittest
+import cPickle as pickle
+import png
+from numpy import zeros, uint8, memmap, linspace, floor, array
+from numpy.random import rand, randint, seed
+from pymote.environment import Environment2D
+
+
+class TestEnvironmentLoading(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'plan.png')
+        rgb = zeros((20, 30, 3), dtype=uint8) + 255
+        rgb[2, 5, 0] = 0  # obstacle in first channel, row 2 from top
+        rgb[3, 5, 1] = 0  # not an obstacle, only first channel is used
+        png.from_array(rgb.reshape(20, -1), 'RGB').save(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_cached_image(self):
+        """Decoded image is flipped, cached and memory-mapped on reload."""
+        env = Environment2D(path=self.path, cache=True)
+        self.assertEqual(env.im.shape, (20, 30))
+        self.assertEqual(env.im[17, 5], 0)
+        self.assertEqual(env.im[16, 5], 255)
+        self.assertTrue(os.path.exists(self.path + '.npy'))
+        loaded = Environment2D(path=self.path, cache=True)
+        self.assertTrue(isinstance(loaded.im, memmap))
+        self.assertEqual(loaded.im.tolist(), env.im.tolist())
+        self.assertRaises(ValueError, loaded.im.__setitem__, (0, 0), 0)
+        unpickled = pickle.loads(pickle.dumps(loaded, 2))
+        self.assertTrue(isinstance(unpickled.im, memmap))
+        self.assertFalse(unpickled.is_space([5.5, 17.5]))
+        uncached = Environment2D(path=self.path, cache=False)
+        self.assertFalse(isinstance(uncached.im, memmap))
+        self.assertEqual(uncached.im.tolist(), env.im.tolist())
+
+    def test_cache_opt_in(self):
+        """Cache file is written only when caching is requested."""
+        env = Environment2D(path=self.path)
+        self.assertFalse(os.path.exists(self.path + '.npy'))
+        self.assertFalse(isinstance(env.im, memmap))
+        self.assertEqual(env.im[17, 5], 0)
+
+
+class TestOccupancyPyramid(unittest.TestCase):
+
+    def setUp(self):
+        seed(1)
+        self.env = Environment2D(shape=(103, 151))
+        self.env.im[rand(103, 151) < 0.005] = 0
+        self.env.im[40:50, :100] = 0
+        self.free = self.env.im != 0
+
+    def test_counts(self):
+        """Free rectangles are really free and sampling is uniform."""
+        occupancy = self.env.occupancy
+        self.assertEqual(occupancy.free_count, self.free.sum())
+        c0, r0 = randint(-2, 151, 1000), randint(-2, 103, 1000)
+        c1, r1 = c0 + randint(0, 10, 1000), r0 + randint(0, 10, 1000)
+        for i in occupancy.is_free_rect(c0, r0, c1, r1).nonzero()[0]:
+            self.assertTrue(min(c0[i], r0[i]) >= 0)
+            self.assertTrue(self.free[r0[i]:r1[i] + 1,
+                                      c0[i]:c1[i] + 1].all())
+            self.assertEqual(self.free[r0[i]:r1[i] + 1,
+                                       c0[i]:c1[i] + 1].size,
+                             (r1[i] - r0[i] + 1) * (c1[i] - c0[i] + 1))
+        rows, cols = occupancy.sample(50000)
+        self.assertTrue(self.free[rows, cols].all())
+        self.assertAlmostEqual((cols < 75).mean(),
+                               self.free[:, :75].sum() / float(self.free.sum()),
+                               delta=0.01)
+
+    def test_clear_segments(self):
+        """Segments through free blocks are visible."""
+        xy0 = rand(1000, 2) * (151, 103)
+        xy1 = xy0 + (rand(1000, 2) - .5) * 60
+        clear = self.env.occupancy.clear_segments(xy0, xy1)
+        self.assertTrue(clear.any())
+        for p0, p1 in zip(xy0[clear], xy1[clear]):
+            self.assertTrue(self.env._walk(p0, p1))
+
+
+class TestVisibility(unittest.TestCase):
+
+    def setUp(self):
+        seed(0)
+        self.env = Environment2D(shape=(200, 200))
+        for _i in range(25):
+            r, c = randint(0, 190, 2)
+            self.env.im[r:r + randint(2, 12), c:c + randint(2, 12)] = 0
+        self.env.clear_cache()
+        xy = randint(0, 200, (3000, 2)).astype(float)
+        xy = xy[self.env.is_space_array(xy)]
+        self.xy0, self.xy1 = xy[:len(xy) / 2], xy[len(xy) / 2:2 * (len(xy) / 2)]
+
+    def obstacle_near(self, p0, p1):
+        """ True if there is obstacle within one pixel of segment. """
+        t = linspace(0, 1, 1000)[:, None]
+        x, y = floor(p0 + t * (p1 - p0)).astype(int).T
+        blocked = zeros((202, 202), dtype=bool)
+        blocked[1:-1, 1:-1] = self.env.im == 0
+        for dx in (0, 1, 2):
+            for dy in (0, 1, 2):
+                if blocked[y + dy, x + dx].any():
+                    return True
+        return False
+
+    def test_walk(self):
+        """Visibility matches walk and walk stops at integer destination."""
+        env = self.env
+        for xy0, xy1 in ((self.xy0, self.xy1),
+                         (self.xy0 + rand(*self.xy0.shape),
+                          self.xy1 + rand(*self.xy1.shape))):
+            walk = [env._walk(p0, p1) for p0, p1 in zip(xy0, xy1)]
+            self.assertFalse(all(walk))
+            self.assertEqual(list(env._walk_array(xy0, xy1)), walk)
+            self.assertEqual([env.are_visible(p0, p1)
+                              for p0, p1 in zip(xy0, xy1)], walk)
+            env.clear_cache()
+            self.assertEqual(list(env.are_visible_array(xy0, xy1)), walk)
+            for p0, p1, visible in zip(xy0, xy1, walk):
+                if not visible:
+                    self.assertTrue(self.obstacle_near(p0, p1))
+
+    def test_walk_beyond_destination(self):
+        """Obstacles beyond integer destination don't block it (pinned
+        segments were blocked when walk overshot destination)."""
+        env = Environment2D(shape=(50, 50))
+        env.im[:, 30] = 0
+        env.im[10, :] = 0
+        env.clear_cache()
+        xy0 = array([[5., 22.], [12., 40.], [5., 40.], [12., 40.],
+                     [20., 40.], [5., 15.], [5., 22.]])
+        xy1 = array([[25., 20.], [25., 33.], [25., 33.], [29., 33.],
+                     [29., 20.], [25., 5.], [35., 22.]])
+        visible = [True] * 5 + [False] * 2
+        self.assertEqual([env._walk(p0, p1) for p0, p1 in zip(xy0, xy1)],
+                         visible)
+        self.assertEqual(list(env._walk_array(xy0, xy1)), visible)
+        self.assertTrue(self.env.are_visible([129., 118.], [44., 125.]))
+
+    def test_assign_image(self):
+        """Assigning new image clears visibility and occupancy caches."""
+        env = Environment2D(shape=(50, 50))
+        p0, p1 = [5.5, 25.5], [45.5, 25.5]
+        self.assertTrue(env.are_visible(p0, p1))
+        self.assertEqual(env.occupancy.free_count, 2500)
+        im = env.im.copy()
+        im[:, 20] = 0
+        env.im = im
+        self.assertFalse(env.are_visible(p0, p1))
+        self.assertFalse(env.are_visible_array(p0, [p1])[0])
+        self.assertEqual(env.occupancy.free_count, 2450)
+        unpickled = pickle.loads(pickle.dumps(env, 2))
+        self.assertEqual(unpickled.im.tolist(), im.tolist())
+        self.assertFalse(unpickled.are_visible(p0, p1))
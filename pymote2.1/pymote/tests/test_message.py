@@ -0,0 +1,84 @@
+import unittest
+import cPickle as pickle
+from numpy import array
+from pymote.message import Message, MessageQueue, FrozenPayloadError, \
+    clone, PAYLOAD_SIZE, packed_size
+from pymote.node import Node
+
+
+class TestFrozenMessage(unittest.TestCase):
+
+    def setUp(self):
+        self.data = {'landmark': array([10., 20., 1.]), 'hops': [1, 2]}
+
+    def test_shared_payload(self):
+        """Frozen data is copied once and shared by message copies."""
+        message = Message(header='Flood', data=self.data, frozen=True)
+        self.data['landmark'][2] = 5
+        self.assertEqual(message.data['landmark'][2], 1)
+        copies = [message.copy() for _i in range(3)]
+        for m in copies:
+            self.assertTrue(m.data is message.data)
+        unfrozen = Message(header='Flood', data=self.data)
+        self.assertFalse(unfrozen.copy().data is unfrozen.copy().data)
+        self.assertEqual(message.message_length(),
+                         len('Flood' + str(message.data)) + 60)
+
+    def test_read_only(self):
+        """Frozen data can not be modified, clone is writable."""
+        data = Message(data=self.data, frozen=True).data
+        self.assertRaises(FrozenPayloadError, data.__setitem__, 'x', 1)
+        self.assertRaises(FrozenPayloadError, data['hops'].append, 3)
+        self.assertRaises(ValueError, data['landmark'].__setitem__, 2, 2.)
+        landmark = clone(data['landmark'])
+        landmark[2] += 1
+        self.assertEqual(data['landmark'][2], 1)
+        writable = clone(data)
+        writable['hops'].append(3)
+        self.assertEqual(writable['hops'], [1, 2, 3])
+        loaded = pickle.loads(pickle.dumps(data, 2))
+        self.assertEqual(loaded['hops'], [1, 2])
+        self.assertEqual(list(loaded['landmark']), [10., 20., 1.])
+        self.assertRaises(FrozenPayloadError, loaded.__setitem__, 'x', 1)
+
+
+class TestMessageLength(unittest.TestCase):
+
+    def tearDown(self):
+        PAYLOAD_SIZE.pop('Packed', None)
+
+    def test_cached_length(self):
+        """Length is calculated once and recalculated on data change."""
+        message = Message(header='Flood', data={'hops': 1})
+        self.assertEqual(message.message_length(), 5 + 11 + 60)
+        message.data['hops'] = 10
+        self.assertEqual(message.copy().message_length(), 5 + 11 + 60)
+        message.data = {'hops': 10}
+        self.assertEqual(message.message_length(), 5 + 12 + 60)
+        message.header = 'F'
+        self.assertEqual(message.message_length(), 1 + 12 + 60)
+
+    def test_packed_size(self):
+        """Registered size function is used for message header."""
+        PAYLOAD_SIZE['Packed'] = packed_size
+        node = Node()
+        message = Message(header='Packed', data={node: array([1., 2., 3.]),
+                                                 'hops': 3, 'ok': True})
+        self.assertEqual(message.message_length(),
+                         6 + (2 + 24) + (4 + 4) + (2 + 1) + 60)
+
+
+class TestMessageQueue(unittest.TestCase):
+
+    def test_insert(self):
+        """Insert matches list.insert for any index."""
+        for index in (0, 1, 3, 5, 100, -1, -3, -5, -100):
+            queue = MessageQueue(range(5))
+            expected = range(5)
+            queue.insert(index, 'm')
+            expected.insert(index, 'm')
+            self.assertEqual(list(queue), expected)
+        queue = MessageQueue()
+        queue.insert(-1, 'm')
+        queue.insert(5, 'n')
+        self.assertEqual(list(queue), ['m', 'n'])
@@ -1,9 +1,16 @@
+import os
 import unittest
+import cPickle as pickle
 from pymote.network import Network
 from pymote.node import Node
-from pymote.environment import Environment2D
-from pymote.channeltype import ChannelType
+from pymote.environment import Environment2D, PymoteEnvironmentError
+from pymote.channeltype import ChannelType, Udg, SquareDisc, Doi
 from pymote.conf import settings
+from numpy import array, sqrt
+from numpy.random import rand, seed
+from networkx import is_connected
+from pymote.simulation import HeadlessSimulation
+from pymote.algorithms.broadcast import Flood
 
 
 class TestNetworkCreation(unittest.TestCase):
@@ -36,3 +43,282 @@ class TestNetworkCreation(unittest.TestCase):
         self.assertTrue(self.net.environment\
                             .are_visible(self.net.pos[self.node2],
                                          self.net.pos[self.node3]))
+
+    def test_visibility_array(self):
+        """Vectorized and cached visibility match scalar walk."""
+        env = self.net.environment
+        env.im[rand(*env.im.shape) < 0.01] = 0
+        env.clear_cache()
+        xy0 = rand(500, 2) * 600
+        xy1 = xy0 + (rand(500, 2) - .5) * 100
+        xy0[:100] = xy0[:100].round()
+        xy1[100:150] = xy0[100:150]
+        xy1[150:200, 0] = xy0[150:200, 0]
+        visible = env.are_visible_array(xy0, xy1)
+        self.assertEqual(list(visible),
+                         [env._walk(p0, p1) for p0, p1 in zip(xy0, xy1)])
+        self.assertEqual(list(visible),
+                         [env.are_visible(p0, p1) for p0, p1 in zip(xy0, xy1)])
+        self.assertEqual(list(env.are_visible_array(xy0[0], xy1[:3])),
+                         [env.are_visible(xy0[0], p1) for p1 in xy1[:3]])
+
+
+class TestEdges(unittest.TestCase):
+
+    def setUp(self):
+        self.net = Network(commRange=50)
+        for _n in range(100):
+            self.net.add_node()
+
+    def assertEdgesMatchRange(self):
+        pos = self.net.pos
+        for n1 in self.net.nodes():
+            for n2 in self.net.nodes():
+                if n1 == n2:
+                    continue
+                d = sqrt(sum(pow(pos[n1] - pos[n2], 2)))
+                self.assertEqual(self.net.has_edge(n1, n2),
+                                 d < n1.commRange or d < n2.commRange)
+
+    def test_spatial_index_edges(self):
+        """Edges found through spatial index match brute force search."""
+        self.assertEdgesMatchRange()
+        for node in self.net.nodes()[::3]:
+            node.commRange = 120
+        self.assertEdgesMatchRange()
+
+    def test_moved_node(self):
+        """Moved node is reindexed and its edges are recalculated."""
+        node = self.net.nodes()[0]
+        self.net.pos[node] = array([5., 5.])
+        self.net.recalculate_edges([node])
+        self.assertTrue(node in self.net.pos.index.query([5., 5.], 1))
+        self.net.remove_node(node)
+        self.assertFalse(node in self.net.pos.index)
+
+    def test_cached_neighbors(self):
+        """Cached neighbors follow node moves and commRange changes."""
+        node = self.net.nodes()[0]
+        scan = lambda: [n for n in self.net.nodes()
+                        if self.net.channelType.in_updated_comm_range(
+                            self.net, node, n)]
+        self.assertEqual(self.net.neighbors(node), scan())
+        self.net.pos[node] = array([300., 300.])
+        self.assertEqual(self.net.neighbors(node), scan())
+        node.commRange = 150
+        self.assertEqual(self.net.neighbors(node), scan())
+
+    def test_ordered_nodes(self):
+        """Nodes stay ordered by id after nodes are removed and added."""
+        nodes = self.net.nodes()
+        self.net.remove_node(nodes[10])
+        self.net.remove_node(nodes[0])
+        node = Node()
+        node.id = nodes[50].id + 0.5
+        self.net.add_node(node)
+        ordered = self.net.nodes()
+        self.assertEqual(ordered, sorted(self.net, key=lambda n: n.id))
+        self.assertEqual(ordered[49], node)
+        self.assertEqual(self.net.node_by_id(nodes[20].id), nodes[20])
+        sub = self.net.subnetwork(ordered[:5])
+        self.assertEqual(sub.nodes(), ordered[:5])
+
+    def test_add_nodes(self):
+        """Bulk added nodes get same edges and skip positions in obstacles."""
+        self.net.environment.im[10, 10] = 0
+        positions = rand(50, 2) * 600
+        positions[0] = [10.5, 10.5]
+        added = self.net.add_nodes(50, positions)
+        self.assertEqual(len(added), 49)
+        self.assertEqual(len(self.net), 149)
+        self.assertEqual(self.net.nodes()[-49:], added)
+        self.assertEdgesMatchRange()
+
+    def test_batch_update(self):
+        """Edges are recalculated once on exit from batch_update."""
+        edges = self.net.number_of_edges()
+        with self.net.batch_update():
+            for node in self.net.nodes():
+                node.commRange = 100
+            self.assertEqual(self.net.number_of_edges(), edges)
+        self.assertTrue(self.net.number_of_edges() > edges)
+        self.assertEdgesMatchRange()
+
+    def test_is_connected(self):
+        """Tracked components match networkx connectivity."""
+        net = Network(commRange=50)
+        for _i in range(60):
+            net.add_node()
+            self.assertEqual(net.is_connected(), is_connected(net))
+        for node in net.nodes()[:30]:
+            net.remove_node(node)
+            self.assertEqual(net.is_connected(), is_connected(net))
+        for commRange in (10, 200, 30):
+            net.set_comm_range(commRange)
+            self.assertEqual(net.is_connected(), is_connected(net))
+
+    def test_link_table(self):
+        """Links match scalar propagation and follow node moves."""
+        for propagation_type in (0, 2):
+            net = Network(commRange=50, propagation_type=propagation_type)
+            for _n in range(30):
+                net.add_node()
+            propagation = net.propagation
+            n1, n2 = net.nodes()[:2]
+            for u, v in net.edges()[:10] + [(n1, n2)]:
+                d, prt, rx_ok = net.link(u, v)
+                self.assertEqual(net.link(v, u), (d, prt, rx_ok))
+                self.assertAlmostEqual(d, net.pos.distance(u, v))
+                if rx_ok is None:
+                    self.assertAlmostEqual(
+                        prt, propagation.shadowing_array(d, noise=0))
+                else:
+                    self.assertAlmostEqual(prt,
+                                           propagation.get_power_ratio(d=d))
+                    self.assertEqual(rx_ok, propagation.is_rx_ok(prt=prt))
+            net.pos[n1] = net.pos[n2] + (3, 4)
+            self.assertEqual(net.link(n1, n2)[0], 5.)
+
+    def test_link_table_moves(self):
+        """Moving node invalidates only links of that node."""
+        net = Network(commRange=50)
+        for x, y in ((0, 0), (30, 0), (0, 30), (100, 100), (130, 100)):
+            net.add_node(pos=(x, y))
+        n0, n1, n2, n3, n4 = net.nodes()
+        for u, v in net.edges():
+            net.link(u, v)
+            net.link(v, u)
+        kept = net._links[n3]
+        net.pos[n0] = (10, 0)
+        self.assertEqual(net.link(n1, n0)[0], 20.)
+        self.assertEqual(net.link(n0, n1)[0], 20.)
+        self.assertAlmostEqual(net.link(n2, n0)[0], sqrt(1000.))
+        self.assertEqual(net.link(n0, n3)[0], net.pos.distance(n0, n3))
+        self.assertTrue(net._links[n3] is kept)
+        self.assertEqual(net.link(n3, n4)[0], 30.)
+        net.remove_node(n1)
+        self.assertFalse(n1 in net._links)
+
+    def test_channel_arrays(self):
+        """Batch channel methods match pairwise methods."""
+        env = self.net.environment
+        nodes = self.net.nodes()
+        source = nodes[0]
+        for channelType in (Udg(env), SquareDisc(env), Doi(env)):
+            seed(1)
+            mask = channelType.in_comm_range_array(self.net, source, nodes)
+            seed(1)
+            self.assertEqual(list(mask),
+                             [channelType.in_comm_range(self.net, source, n)
+                              for n in nodes])
+        net = Network(environment=env, channelType=Doi(env), commRange=50,
+                      doi=0)
+        for node in nodes:
+            net.add_node(pos=self.net.pos[node])
+        self.assertEqual(sorted(net.degree().values()),
+                         sorted(self.net.degree().values()))
+
+    def test_reproducible_edges(self):
+        """Random channel gives same edges for same seed."""
+        edges = []
+        for _i in range(3):
+            seed(3)
+            env = Environment2D()
+            net = Network(environment=env, channelType=SquareDisc(env),
+                          commRange=100)
+            net.add_nodes(300)
+            edges.append(sorted([tuple(sorted((n1.id - net.nodes()[0].id,
+                                               n2.id - net.nodes()[0].id)))
+                                 for n1, n2 in net.edges()]))
+        self.assertEqual(edges[0], edges[1])
+        self.assertEqual(edges[0], edges[2])
+
+    def test_random_space(self):
+        """Random positions on sparse floor plan are all in free space."""
+        env = self.net.environment
+        env.im[:] = 0
+        env.im[100:110, 200:400] = 255
+        env.im[300, 300] = 255
+        env.clear_cache()
+        positions = env.random_space(1000)
+        self.assertTrue(env.is_space_array(positions).all())
+        self.assertTrue(env.is_space(self.net.find_random_pos()))
+        added = self.net.add_nodes(200)
+        self.assertEqual(len(added), 200)
+
+    def test_random_space_blocked(self):
+        """Random positions can't be found on fully blocked floor plan."""
+        env = self.net.environment
+        env.im[:] = 0
+        env.clear_cache()
+        self.assertRaises(PymoteEnvironmentError, env.random_space, 10)
+        self.assertRaises(PymoteEnvironmentError, self.net.find_random_pos)
+        self.assertRaises(PymoteEnvironmentError, self.net.add_nodes, 5)
+        self.assertEqual(len(self.net.add_nodes(1, positions=[(10, 10)])), 0)
+
+
+class TestSolvedCommRange(unittest.TestCase):
+
+    def setUp(self):
+        self.net = Network(commRange=10)
+        for x in range(10):
+            for y in range(10):
+                self.net.add_node(pos=[25. + 50 * x, 25. + 50 * y], ori=0)
+
+    def test_grid_connectivity(self):
+        """Regular grid is connected with solved commRange."""
+        comm_range = self.net.connectivity_comm_range()
+        self.assertTrue(comm_range > 50.)
+        self.net.set_comm_range(comm_range)
+        self.assertEqual(len(self.net.edges()), 180)
+        self.assertTrue(is_connected(self.net))
+
+    def test_duplicated_distances(self):
+        """All pairs at critical distance are in range if it is repeated."""
+        comm_range = self.net.comm_range_for_degree(2)
+        self.net.set_comm_range(comm_range)
+        self.assertEqual(len(self.net.edges()), 180)
+        comm_range = self.net.comm_range_for_degree(3.6)
+        self.assertTrue(50. < comm_range < 50 * sqrt(2))
+
+
+class TestPickle(unittest.TestCase):
+
+    def test_pickle(self):
+        """Network is pickled with any protocol."""
+        net = Network(commRange=100)
+        net.add_nodes(20)
+        for protocol in (0, 2):
+            loaded = pickle.loads(pickle.dumps(net, protocol))
+            self.assertEqual([n.id for n in loaded.nodes()],
+                             [n.id for n in net.nodes()])
+            self.assertEqual(len(loaded.edges()), len(net.edges()))
+            self.assertTrue(loaded.add_node() in loaded)
+
+    def test_old_pickle(self):
+        """Network pickled before NodeStore is loaded and can be used."""
+        # 3 nodes at (5, 5), (15, 5), (15, 15) with commRange 20, first
+        # node is IDLE with message in outbox
+        path = os.path.join(os.path.dirname(__file__), 'old_network.pickle')
+        with open(path, 'rb') as fh:
+            net = pickle.load(fh)
+        nodes = net.nodes()
+        self.assertEqual(len(nodes), 3)
+        self.assertTrue(array(net.pos[nodes[2]] == [15., 15.]).all())
+        self.assertAlmostEqual(net.ori[nodes[0]], 0.5)
+        self.assertEqual(net.queued_messages, 1)
+        self.assertEqual(net.status_counts['IDLE'], 1)
+        self.assertEqual(net.neighbors(nodes[0]), nodes)
+        node = net.add_node(pos=[35., 35.])
+        net.recalculate_edges()
+        self.assertEqual(net.neighbors(node), [node])
+        self.assertFalse(is_connected(net))
+        net.algorithms = ((Flood, {'informationKey': 'I'}),)
+        sim = HeadlessSimulation(net)
+        sim.reset()
+        self.assertEqual(net.queued_messages, 0)
+        nodes[0].memory['I'] = 'information'
+        sim.run()
+        self.assertTrue(sim.is_halted())
+        for n in nodes:
+            self.assertEqual(n.memory['I'], 'information')
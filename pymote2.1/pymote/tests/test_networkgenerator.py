@@ -8,6 +8,7 @@ from pymote.channeltype import Udg
 from pymote.sensor import NeighborsSensor
 from pymote.algorithms.readsensors import ReadSensors
 from inspect import isclass
+from networkx import is_connected
 
 
 class TestNetworkGeneration(unittest.TestCase):
@@ -82,3 +83,17 @@ class TestNetworkGeneration(unittest.TestCase):
                     net.validate_params(output)
                 except AssertionError:
                     self.fail("Network params did not validate.")
+
+    def test_solved_comm_range(self):
+        """Test commRange solved directly for degree and connectivity"""
+        net_gen = NetworkGenerator(n_count=300, connected=False, degree=10)
+        net = net_gen.generate_random_network()
+        self.assertEqual(len(net), 300)
+        self.assertAlmostEqual(net.avg_degree(), 10, delta=settings.DEG_ATOL)
+        comm_range = net.connectivity_comm_range()
+        net.modify_avg_degree(4)
+        self.assertAlmostEqual(net.avg_degree(), 4, delta=settings.DEG_ATOL)
+        net.set_comm_range(comm_range)
+        self.assertTrue(is_connected(net))
+        net.set_comm_range(comm_range * 0.99)
+        self.assertFalse(is_connected(net))
@@ -0,0 +1,36 @@
+import unittest
+from numpy import array, allclose
+from pymote.nodestore import NodeStore, NodePositions, NodeOrientations
+
+
+class TestNodeStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = NodeStore(capacity=2)
+        self.pos = NodePositions(self.store, cell_size=10)
+        self.ori = NodeOrientations(self.store)
+        self.nodes = ['n%d' % i for i in range(5)]
+        for i, node in enumerate(self.nodes):
+            self.pos[node] = array([i, 2. * i])
+            self.ori[node] = 0.1 * i
+
+    def test_views(self):
+        """Views behave like dictionaries after rows are moved."""
+        self.assertEqual(len(self.pos), 5)
+        del self.pos[self.nodes[1]]
+        self.ori.pop(self.nodes[1])
+        self.assertFalse(self.nodes[1] in self.pos)
+        self.assertFalse(self.nodes[1] in self.store)
+        self.assertEqual(set(self.pos), set(self.nodes) - set([self.nodes[1]]))
+        self.assertTrue(allclose(self.pos[self.nodes[4]], [4, 8]))
+        self.assertAlmostEqual(self.ori[self.nodes[4]], 0.4)
+        self.pos[self.nodes[4]] += (1, 1)
+        self.assertTrue(allclose(self.pos[self.nodes[4]], [5, 9]))
+        self.assertRaises(KeyError, self.pos.__getitem__, self.nodes[1])
+
+    def test_distances(self):
+        """Vectorized distances match pairwise distances."""
+        d = self.pos.distances(self.nodes[0], self.nodes[1:3])
+        self.assertTrue(allclose(d, [5 ** 0.5, 20 ** 0.5]))
+        self.assertAlmostEqual(self.pos.distance(self.nodes[0], self.nodes[2]),
+                               20 ** 0.5)
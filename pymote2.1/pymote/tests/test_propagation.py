@@ -0,0 +1,31 @@
+import unittest
+from numpy import array, allclose, log10
+from numpy.random import seed
+from pymote.propagation import PropagationModel
+
+
+class TestPropagationArray(unittest.TestCase):
+
+    def setUp(self):
+        self.d = array([1., 5., 20., 50., 150., 400., 1000.])
+
+    def test_power_ratio(self):
+        """Batch power ratios and rx masks match scalar methods."""
+        for propagation_type in (0, 1, 2):
+            model = PropagationModel(propagation_type=propagation_type)
+            seed(1)
+            scalar = [model.get_power_ratio(d=d, p_tx=0.5) for d in self.d]
+            seed(1)
+            batch = model.get_power_ratio_array(self.d, p_tx=0.5)
+            self.assertTrue(allclose(scalar, batch, rtol=1e-12))
+            self.assertEqual(list(model.is_rx_ok_array(prt=batch)),
+                             [model.is_rx_ok(prt=prt) for prt in scalar])
+
+    def test_shadowing(self):
+        """Shadowing without noise is mean of path loss model."""
+        model = PropagationModel(propagation_type=2)
+        rssi = model.shadowing_rssi_array(self.d, noise=0)
+        power = model.shadowing_array(self.d, noise=0)
+        self.assertTrue(allclose(PropagationModel.pw_to_dbm(power), rssi))
+        self.assertTrue(allclose(rssi - rssi[0],
+                                 -10 * model.BETA * log10(self.d)))
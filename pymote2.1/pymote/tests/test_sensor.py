@@ -1,7 +1,12 @@
 import unittest
 from pymote.node import Node
 from pymote.network import Network
-from pymote.sensor import NeighborsSensor, DistSensor
+from pymote.sensor import NeighborsSensor, AoASensor, DistSensor, \
+    ProbabilityFunction, read_sensors, reset_noise_streams
+from pymote.conf import settings
+from pymote.algorithms.readsensors import ReadSensors
+from numpy import arange, array, allclose
+from numpy.random import seed
 import scipy.stats
 
 
@@ -31,3 +36,105 @@ class TestSensor(unittest.TestCase):
                         'Dist' in readings.keys())
 
         #TODO: check normal distribution
+
+
+class TestReadSensors(unittest.TestCase):
+
+    def setUp(self):
+        seed(2)
+        self.net = Network(commRange=120)
+        self.net.add_nodes(40)
+        pf = {'pf': scipy.stats.norm, 'scale': 1e-9}
+        for node in self.net.nodes():
+            node.compositeSensor = (NeighborsSensor, AoASensor(pf),
+                                    DistSensor(pf))
+
+    def test_bulk_read(self):
+        """Bulk readings match readings of each node."""
+        readings = read_sensors(self.net)
+        for node in self.net.nodes():
+            single = node.compositeSensor.read()
+            self.assertEqual(readings[node]['Neighbors'], single['Neighbors'])
+            for key in ('AoA', 'Dist'):
+                self.assertEqual(set(readings[node][key]), set(single[key]))
+                neighbors = single['Neighbors']
+                self.assertTrue(allclose(
+                    [readings[node][key][n] for n in neighbors],
+                    [single[key][n] for n in neighbors], atol=1e-6))
+        sensor = DistSensor({'pf': scipy.stats.norm, 'scale': 1e-9})
+        sources, destinations = zip(*self.net.edges())
+        self.assertTrue(allclose(
+            sensor.measure(self.net, sources, destinations),
+            [self.net.pos.distance(*edge) for edge in self.net.edges()],
+            atol=1e-6))
+
+    def test_algorithm(self):
+        """ReadSensors saves bulk readings in node memory."""
+        ReadSensors(self.net).run()
+        for node in self.net.nodes():
+            readings = node.memory['sensorReadings']
+            self.assertEqual(readings['Neighbors'],
+                             self.net.neighbors(node))
+            self.assertEqual(set(readings['Dist']), set(readings['Neighbors']))
+        self.assertRaises(Exception, read_sensors, self.net, [Node()])
+
+
+class TestProbabilityFunction(unittest.TestCase):
+
+    def setUp(self):
+        self.values = arange(1000.)
+
+    def test_batch_reading(self):
+        """Batch readings are reproducible and match single readings."""
+        pf = ProbabilityFunction(scale=2, pf=scipy.stats.norm)
+        seed(1)
+        single = [pf.getNoisyReading(value) for value in self.values[:10]]
+        seed(1)
+        self.assertTrue(allclose(pf.getNoisyReadings(self.values[:10]),
+                                 single))
+        self.assertEqual(len(pf.getNoisyReadings([])), 0)
+
+    def test_pool(self):
+        """Pooled noise with seed is reproducible and distributed."""
+        readings = []
+        for _i in range(2):
+            reset_noise_streams()
+            pf = ProbabilityFunction(scale=2, pf=scipy.stats.norm,
+                                     pool_size=300, seed=3)
+            readings.append([pf.getNoisyReading(1.)] +
+                            list(pf.getNoisyReadings(self.values)))
+        self.assertEqual(readings[0], readings[1])
+        noise = array(readings[0][1:]) - self.values
+        self.assertAlmostEqual(noise.mean(), 0, delta=0.3)
+        self.assertAlmostEqual(noise.std(), 2, delta=0.3)
+
+    def test_shared_stream(self):
+        """Probability functions with the same seed share noise stream."""
+        for pool_size in (0, 300):
+            reset_noise_streams()
+            pfs = [ProbabilityFunction(scale=2, pf=scipy.stats.norm,
+                                       pool_size=pool_size, seed=5)
+                   for _i in range(2)]
+            first = pfs[0].getNoisyReadings(self.values[:10])
+            self.assertFalse(allclose(pfs[1].getNoisyReadings(
+                self.values[:10]), first))
+            reset_noise_streams()
+            self.assertTrue(allclose([pfs[1].getNoisyReading(value)
+                                      for value in self.values[:10]], first))
+
+    def test_seeded_sensors(self):
+        """Seeded sensors of nodes are read together with independent
+        noise and settings are not changed."""
+        params = dict(settings.DIST_PF_PARAMS)
+        net = Network(commRange=200)
+        nodes = [net.add_node(pos=[100. + 10 * i, 100.]) for i in range(3)]
+        pf = {'pf': scipy.stats.norm, 'scale': 1, 'seed': 7}
+        for node in nodes:
+            node.compositeSensor = (DistSensor(pf),)
+        self.assertEqual(settings.DIST_PF_PARAMS, params)
+        keys = set([node.compositeSensor.sensors[0].bulk_key()
+                    for node in nodes])
+        self.assertEqual(len(keys), 1)
+        readings = read_sensors(net)
+        noise = [readings[node]['Dist'][node] for node in nodes]
+        self.assertEqual(len(set(noise)), 3)
@@ -0,0 +1,191 @@
+import unittest
+from pymote.network import Network
+from pymote.simulation import HeadlessSimulation, SimulationObserver, \
+    EventSimulation
+from pymote.algorithm import NodeAlgorithm
+from pymote.algorithms.broadcast import Flood
+
+
+class StopAfterFirstStep(Flood):
+
+    def is_terminated(self):
+        return self.network.algorithmState['step'] > 1
+
+
+class CountingFlood(Flood):
+
+    def step(self, node):
+        self.stepped.append(node)
+        return super(CountingFlood, self).step(node)
+
+
+class PeriodicBeacon(NodeAlgorithm):
+    """ Every node counts timers that fire each 10 time units. """
+    default_params = {'period': 10, 'count': 3}
+
+    def initializer(self):
+        for node in self.network.nodes():
+            node.status = 'IDLE'
+            node.memory['fired'] = []
+            self.network.timing.set_timer(node, self.period)
+
+    def idle(self, node, message):
+        if message.header == NodeAlgorithm.TIMER:
+            node.memory['fired'].append(self.network.timing.time)
+            if len(node.memory['fired']) < self.count:
+                self.network.timing.set_timer(node, self.period)
+
+    STATUS = {'IDLE': idle}
+
+
+class CountdownTimer(NodeAlgorithm):
+    """ First node counts down timer in step without any messages. """
+    default_params = {'timer': 5}
+
+    def initializer(self):
+        for node in self.network.nodes():
+            node.status = 'IDLE'
+        node = self.network.nodes()[0]
+        node.memory['Timer'] = self.timer
+        node.status = 'LISTENING'
+
+    def step(self, node):
+        if node.status == 'LISTENING':
+            node.memory['Timer'] -= 1
+            if node.memory['Timer'] == 0:
+                node.status = 'DONE'
+
+    STATUS = {}
+
+
+class RecordingObserver(SimulationObserver):
+
+    def __init__(self):
+        self.events = []
+
+    def redraw(self, simulation):
+        self.events.append('redraw')
+
+    def update_log(self, simulation, text):
+        self.events.append(text)
+
+
+class TestHeadlessSimulation(unittest.TestCase):
+
+    def setUp(self):
+        self.net = Network(commRange=700)
+        for _n in range(20):
+            self.net.add_node()
+        self.net.algorithms = ((Flood, {'informationKey': 'I'}),)
+        self.net.nodes()[0].memory['I'] = 'information'
+
+    def test_run(self):
+        """Flood reaches all nodes and observer is notified."""
+        observer = RecordingObserver()
+        sim = HeadlessSimulation(self.net, observers=(observer,))
+        sim.run()
+        self.assertTrue(self.net.algorithmState['finished'])
+        for node in self.net.nodes():
+            self.assertEqual(node.memory['I'], 'information')
+        self.assertEqual(observer.events, ['redraw', 'redraw'])
+
+    def test_stepping(self):
+        """Stepping stops after given number of steps."""
+        sim = HeadlessSimulation(self.net)
+        sim.run(1)
+        self.assertFalse(self.net.algorithmState['finished'])
+        self.assertEqual(self.net.algorithmState['step'], 2)
+        sim.run()
+        self.assertTrue(self.net.algorithmState['finished'])
+
+    def test_queued_messages(self):
+        """Network counters match messages and statuses of nodes."""
+        sim = HeadlessSimulation(self.net)
+        while not self.net.algorithmState['finished']:
+            sim.run(1)
+            nodes = self.net.nodes()
+            self.assertEqual(self.net.queued_messages,
+                             sum([len(n.inbox) + len(n.outbox)
+                                  for n in nodes]))
+            for status in set([n.status for n in nodes]):
+                self.assertEqual(self.net.status_counts[status],
+                                 [n.status for n in nodes].count(status))
+        self.assertTrue(sim.is_halted())
+
+    def test_is_terminated(self):
+        """Algorithm can declare its own termination condition."""
+        self.net.algorithms = ((StopAfterFirstStep, {'informationKey': 'I'}),)
+        self.net.nodes()[0].memory['I'] = 'information'
+        sim = HeadlessSimulation(self.net)
+        sim.run()
+        self.assertTrue(self.net.algorithmState['finished'])
+        self.assertEqual(self.net.algorithmState['step'], 2)
+
+    def test_active_nodes(self):
+        """Only nodes with messages are stepped unless always_step is set."""
+        for always_step in (False, True):
+            self.net.algorithms = ((CountingFlood, {'informationKey': 'I',
+                                                    'always_step': always_step,
+                                                    'stepped': []}),)
+            sim = HeadlessSimulation(self.net)
+            sim.reset()
+            self.net.nodes()[0].memory['I'] = 'information'
+            sim.run()
+            algorithm = self.net.algorithms[0]
+            steps = self.net.algorithmState['step'] - 1
+            if always_step:
+                self.assertEqual(len(algorithm.stepped),
+                                 steps * len(self.net))
+            else:
+                self.assertTrue(len(algorithm.stepped) <
+                                steps * len(self.net))
+            for node in self.net.nodes():
+                self.assertEqual(node.memory['I'], 'information')
+
+    def test_step_timer(self):
+        """Timers counted in step fire although no node has messages."""
+        for always_step in (False, True):
+            self.net.algorithms = ((CountdownTimer,
+                                    {'always_step': always_step}),)
+            sim = HeadlessSimulation(self.net)
+            sim.reset()
+            sim.run(100)
+            self.assertTrue(self.net.algorithmState['finished'])
+            self.assertEqual(self.net.algorithmState['step'], 6)
+            self.assertEqual(self.net.nodes()[0].status, 'DONE')
+
+
+class TestEventSimulation(unittest.TestCase):
+
+    def setUp(self):
+        self.net = Network(commRange=150)
+        for _n in range(30):
+            self.net.add_node()
+
+    def test_flood(self):
+        """Flood informs same nodes as synchronous simulation."""
+        self.net.algorithms = ((Flood, {'informationKey': 'I'}),)
+        self.net.nodes()[0].memory['I'] = 'information'
+        sim = EventSimulation(self.net)
+        sim.run()
+        informed = [n for n in self.net.nodes() if 'I' in n.memory]
+        sim = HeadlessSimulation(self.net)
+        sim.reset()
+        self.net.nodes()[0].memory['I'] = 'information'
+        sim.run()
+        self.assertEqual(informed,
+                         [n for n in self.net.nodes() if 'I' in n.memory])
+        self.assertTrue(self.net.timing is None)
+
+    def test_timers(self):
+        """Timers fire in time order and can be cancelled."""
+        self.net.algorithms = ((PeriodicBeacon, {}),)
+        sim = EventSimulation(self.net)
+        sim.run()
+        for node in self.net.nodes():
+            self.assertEqual(node.memory['fired'], [10., 20., 30.])
+        self.assertEqual(self.net.algorithmState['step'],
+                         3 * len(self.net) + 1)
+        timer = sim.timing.set_timer(self.net.nodes()[0], 5)
+        timer.cancel()
+        self.assertEqual(sim.timing.pop(), None)
@@ -0,0 +1,229 @@
+import unittest
+import cPickle as pickle
+from numpy import mean, std
+from pymote.utils.statbuffer import StatBuffer
+from pymote.node import Node
+from pymote.message import Message
+
+
+# Node with status, memory, energy trace and message in outbox pickled with
+# protocol 0 before Node and Message had __slots__.
+OLD_NODE_PICKLE = """ccopy_reg
+_reconstructor
+p1
+(cpymote.node
+Node
+p2
+c__builtin__
+object
+p3
+NtRp4
+(dp5
+S'_commRange'
+p6
+I50
+sS'status'
+p7
+S'IDLE'
+p8
+sS'network'
+p9
+NsS'power'
+p10
+g1
+(cpymote.energy
+EnergyModel
+p11
+g3
+NtRp12
+(dp13
+S'power_type'
+p14
+I1
+sS'energy'
+p15
+F2
+sS'type'
+p16
+S'N'
+sS'energy_consumption'
+p17
+I0
+sbsS'mobility'
+p18
+g1
+(cpymote.mobility
+MobilityModel
+p19
+g3
+NtRp20
+(dp21
+S'moved_z'
+p22
+I0
+sS'moved_y'
+p23
+I0
+sS'moved_x'
+p24
+I0
+sg16
+S'N'
+sS'mobile_type'
+p25
+I0
+sbsS'n_received_failed_power'
+p26
+I0
+sg15
+(lp27
+F2
+aF1.5
+asS'_inbox'
+p28
+(lp29
+sS'n_received_failed_loss'
+p30
+I0
+sS'_inboxDelay'
+p31
+I01
+sS'n_transmitted_failed_power'
+p32
+I0
+sS'n_transmitted'
+p33
+I0
+sS'snr'
+p34
+(lp35
+sS'_compositeSensor'
+p36
+g1
+(cpymote.sensor
+CompositeSensor
+p37
+g3
+NtRp38
+(dp39
+S'node'
+p40
+g4
+sS'_sensors'
+p41
+(g1
+(cpymote.sensor
+NeighborsSensor
+p42
+g3
+NtRp43
+(dp44
+S'probabilityFunction'
+p45
+Nsbtp46
+sbsS'memory'
+p47
+(dp48
+S'I'
+S'information'
+p49
+ssS'outbox'
+p50
+(lp51
+g1
+(cpymote.message
+Message
+p52
+g3
+NtRp53
+(dp54
+S'destination'
+p55
+NsS'overhead_bytes'
+p56
+I60
+sS'header'
+p57
+S'Flood'
+p58
+sS'nexthop'
+p59
+NsS'source'
+p60
+NsS'data'
+p61
+(dp62
+S'hops'
+p63
+I1
+ssbasS'n_received'
+p64
+I0
+sg16
+S'N'
+sS'id'
+p65
+I7
+sS'distance'
+p66
+(lp67
+sb."""
+
+
+class TestStatBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.values = [3., 1., 4., 1., 5., 9., 2., 6.]
+
+    def fill(self, buf):
+        for value in self.values:
+            buf.append(value)
+        return buf
+
+    def test_retention(self):
+        """Policies keep all, last or no values but the same summary."""
+        kept = {'all': self.values, 'last': self.values[-3:], 'summary': []}
+        for policy, values in kept.items():
+            buf = self.fill(StatBuffer(policy, size=3))
+            self.assertEqual(list(buf), values)
+            self.assertEqual(len(buf), len(values))
+            self.assertEqual(buf.count, len(self.values))
+            self.assertAlmostEqual(buf.mean(), mean(self.values))
+            self.assertAlmostEqual(buf.std(), std(self.values))
+            self.assertEqual((buf.min, buf.max, buf.last), (1., 9., 6.))
+        buf = self.fill(StatBuffer('last', size=3))
+        self.assertEqual(buf[-1], 6.)
+        self.assertEqual(buf.pop(), 6.)
+        self.assertEqual(list(buf), [9., 2.])
+        self.assertEqual(list(pickle.loads(pickle.dumps(buf, 2))), [9., 2.])
+
+    def test_slots(self):
+        """Nodes and messages have no instance dict."""
+        self.assertFalse(hasattr(Node(), '__dict__'))
+        message = Message(header='Test', data={'a': 1})
+        self.assertFalse(hasattr(message, '__dict__'))
+        copied = message.copy()
+        self.assertEqual((copied.header, copied.data), ('Test', {'a': 1}))
+        self.assertEqual(copied.message_length(), message.message_length())
+
+    def test_pickle(self):
+        """Nodes and messages are pickled with any protocol and nodes
+        pickled before __slots__ are loaded."""
+        node = Node()
+        node.status = 'IDLE'
+        node.energy.append(1.)
+        node.outbox.appendleft(Message(header='Test', data={'a': 1}))
+        for protocol in (0, 2):
+            loaded = pickle.loads(pickle.dumps(node, protocol))
+            self.assertEqual((loaded.id, loaded.status), (node.id, 'IDLE'))
+            self.assertEqual(list(loaded.energy), [1.])
+            self.assertEqual(loaded.outbox[0].data, {'a': 1})
+        old = pickle.loads(OLD_NODE_PICKLE)
+        self.assertEqual((old.id, old.status, old.commRange), (7, 'IDLE', 50))
+        self.assertEqual(old.memory, {'I': 'information'})
+        self.assertTrue(isinstance(old.energy, StatBuffer))
+        self.assertEqual(list(old.energy), [2., 1.5])
+        message = old.outbox.pop()
+        self.assertEqual((message.header, message.data), ('Flood', {'hops': 1}))
+        self.assertEqual(message.message_length(), 5 + 11 + 60)
+        self.assertFalse(hasattr(old, '__dict__'))
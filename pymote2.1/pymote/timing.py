@@ -1,3 +1,101 @@
+"""
+Simulation clock and timers used by event driven simulation.
+
+:class:`TimingModel` keeps a priority queue of timestamped events: message
+deliveries scheduled by network and timers armed by algorithms. Events are
+popped in order of their time, events with the same time in order in which
+they were scheduled.
+
+Timers are delivered to node algorithm as messages with header
+NodeAlgorithm.TIMER and timer data so they are handled by STATUS methods:
+
+>>> timer = net.timing.set_timer(node, 5, data='beacon')
+>>> timer.cancel()
+
+"""
+from heapq import heappush, heappop
+
+from pymote.message import Message
+
+TIMER = 'timer'
+
+
+class Timer(object):
+    """ Timer armed for node that fires at given time unless cancelled. """
+
+    def __init__(self, node, time, data=None):
+        self.node = node
+        self.time = time
+        self.data = data
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __repr__(self):
+        return '<Timer node=%s time=%s>' % (self.node, self.time)
+
+
 class TimingModel(object):
-  def __init__(self, node):
-    # do_something
+    """
+    Simulation clock with queue of message deliveries and timers.
+
+    Each message hop takes `hop_latency` time, override latency() for i.e.
+    distance dependent latency.
+
+    """
+
+    def __init__(self, hop_latency=1.):
+        self.hop_latency = hop_latency
+        self.reset()
+
+    def __len__(self):
+        return len(self._events)
+
+    def reset(self):
+        """ Set clock to zero and remove all pending events. """
+        self.time = 0.
+        self.clear()
+
+    def clear(self):
+        """ Remove all pending events, clock is not changed. """
+        self._events = []
+        self._seq = 0
+
+    def _schedule(self, time, node, message, timer=None):
+        assert time >= self.time, 'Event can not be scheduled in the past.'
+        heappush(self._events, (time, self._seq, node, message, timer))
+        self._seq += 1
+
+    def latency(self, source, destination):
+        """ Returns time it takes message to pass from source to
+        destination. """
+        return self.hop_latency
+
+    def deliver(self, destination, message):
+        """ Schedule delivery of message to destination node. """
+        latency = self.latency(message.source, destination)
+        self._schedule(self.time + latency, destination, message)
+
+    def set_timer(self, node, delay, data=None):
+        """ Arm timer that fires for node after delay, returns Timer. """
+        timer = Timer(node, self.time + delay, data)
+        self._schedule(timer.time, node,
+                       Message(header=TIMER, destination=node, data=data),
+                       timer)
+        return timer
+
+    def pop(self):
+        """
+        Returns next event as (node, message, timer) and advances clock to
+        its time, timer is None for message delivery. Returns None if there
+        are no more events.
+
+        """
+        while self._events:
+            time, _seq, node, message, timer = heappop(self._events)
+            if timer is not None and timer.cancelled:
+                continue
+            self.time = time
+            return node, message, timer
+        return None
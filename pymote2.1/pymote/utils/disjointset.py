@@ -0,0 +1,60 @@
+"""
+Disjoint set (union-find) structure used for connectivity of network nodes.
+"""
+
+
+class DisjointSet(object):
+    """
+    Union-find over hashable items with path compression and union by size.
+
+    >>> ds = DisjointSet([n1, n2, n3])
+    >>> ds.union(n1, n2)
+    True
+    >>> ds.count
+    2
+
+    """
+
+    def __init__(self, items=()):
+        self._parent = {}
+        self._size = {}
+        self.count = 0  # number of disjoint sets
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self._parent)
+
+    def __contains__(self, item):
+        return item in self._parent
+
+    def add(self, item):
+        if item not in self._parent:
+            self._parent[item] = item
+            self._size[item] = 1
+            self.count += 1
+
+    def find(self, item):
+        parent = self._parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, item1, item2):
+        """ Merge sets of given items, returns False if already merged. """
+        root1 = self.find(item1)
+        root2 = self.find(item2)
+        if root1 == root2:
+            return False
+        if self._size[root1] < self._size[root2]:
+            root1, root2 = root2, root1
+        self._parent[root2] = root1
+        self._size[root1] += self._size.pop(root2)
+        self.count -= 1
+        return True
+
+    def connected(self, item1, item2):
+        return self.find(item1) == self.find(item2)
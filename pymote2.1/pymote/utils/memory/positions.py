@@ -1,3 +1,4 @@
+from collections import Mapping
 from copy import copy
 from pymote.utils.memory import MemoryStructure
 
@@ -39,7 +40,7 @@ class Positions(MemoryStructure):
         """
         if not isinstance(obj, cls):
             if not isinstance(obj, list):
-                assert isinstance(obj, dict)
+                assert isinstance(obj, Mapping)
                 obj = [obj]
             obj = cls(obj)
         return obj
@@ -0,0 +1,131 @@
+"""
+Bounded buffers for per node traces (energy, distance, snr).
+"""
+from numpy import array, empty, concatenate, inf, sqrt
+
+
+class StatBuffer(object):
+    """
+    Trace of float values with configurable retention.
+
+    Retention policy:
+        * 'all' - all values are kept in list
+        * 'last' - only last `size` values are kept in preallocated ring array
+        * 'summary' - no values are kept
+
+    Summary statistics (count, mean, std, min, max, last) are always
+    available so traces can be reduced to 'summary' without losing them.
+
+    >>> snr = StatBuffer('last', size=2)
+    >>> for value in (1., 2., 3.): snr.append(value)
+    >>> list(snr), snr.count, snr.mean()
+    ([2.0, 3.0], 3, 2.0)
+
+    """
+
+    __slots__ = ('policy', 'size', '_values', '_head', '_length', 'count',
+                 '_sum', '_sum_sq', 'min', 'max', 'last')
+
+    POLICIES = ('all', 'last', 'summary')
+
+    def __init__(self, policy='all', size=100):
+        assert policy in self.POLICIES, 'Unknown retention policy %s' % policy
+        assert policy != 'last' or size > 0
+        self.policy = policy
+        self.size = size
+        self.clear()
+
+    def clear(self):
+        if self.policy == 'all':
+            self._values = []
+        elif self.policy == 'last':
+            self._values = empty(self.size)
+        else:
+            self._values = None
+        self._head = 0  # index of the oldest value in ring
+        self._length = 0  # number of values in ring
+        self.count = 0
+        self._sum = self._sum_sq = 0.
+        self.min = inf
+        self.max = -inf
+        self.last = None
+
+    def append(self, value):
+        self.count += 1
+        self._sum += value
+        self._sum_sq += value * value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.last = value
+        if self.policy == 'all':
+            self._values.append(value)
+        elif self.policy == 'last':
+            if self._length < self.size:
+                self._values[(self._head + self._length) % self.size] = value
+                self._length += 1
+            else:
+                self._values[self._head] = value
+                self._head = (self._head + 1) % self.size
+
+    def pop(self):
+        """ Remove and return last kept value. """
+        if self.policy == 'all':
+            return self._values.pop()
+        if not self._length:
+            raise IndexError('pop from empty StatBuffer')
+        self._length -= 1
+        return self._values[(self._head + self._length) % self.size]
+
+    def values(self):
+        """ Returns kept values as list from oldest to newest. """
+        if self.policy == 'all':
+            return list(self._values)
+        if self.policy == 'summary':
+            return []
+        end = self._head + self._length
+        if end <= self.size:
+            return list(self._values[self._head:end])
+        return list(concatenate((self._values[self._head:],
+                                 self._values[:end - self.size])))
+
+    def mean(self):
+        """ Mean of all appended values, nan if empty. """
+        if not self.count:
+            return float('nan')
+        return self._sum / self.count
+
+    def std(self):
+        """ Standard deviation of all appended values, nan if empty. """
+        if not self.count:
+            return float('nan')
+        mean = self.mean()
+        return sqrt(max(self._sum_sq / self.count - mean * mean, 0.))
+
+    def __len__(self):
+        if self.policy == 'all':
+            return len(self._values)
+        return self._length
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def __getitem__(self, index):
+        if self.policy == 'all':
+            return self._values[index]
+        return self.values()[index]
+
+    def __array__(self, dtype=None):
+        return array(self.values(), dtype=dtype)
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return 'StatBuffer(%s, count=%d, mean=%s)' % (self.policy, self.count,
+                                                     self.mean())